@@ -0,0 +1,44 @@
+"""add road simplified geometries
+
+Revision ID: 5c1e7b2d9f40
+Revises: 3a2ef1f25793
+Create Date: 2025-10-02 11:14:27.530118
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+import geoalchemy2
+
+# revision identifiers, used by Alembic.
+revision: str = '5c1e7b2d9f40'
+down_revision: Union[str, Sequence[str], None] = '3a2ef1f25793'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+# Колонка и допуск упрощения в градусах (~1 пиксель на соответствующем зуме)
+LEVELS = (
+    ('geom_z8', 0.005),
+    ('geom_z11', 0.0005),
+    ('geom_z14', 0.00005),
+)
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    for column, _ in LEVELS:
+        op.add_column('roads', sa.Column(column, geoalchemy2.types.Geometry(geometry_type='LINESTRING', srid=4326, dimension=2, from_text='ST_GeomFromEWKT', name='geometry', spatial_index=False), nullable=True))
+
+    # Заполняем упрощенные геометрии для существующих дорог
+    op.execute(
+        "UPDATE roads SET " + ", ".join(
+            f"{column} = ST_SimplifyPreserveTopology(geom, {tolerance})" for column, tolerance in LEVELS
+        )
+    )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    for column, _ in reversed(LEVELS):
+        op.drop_column('roads', column)
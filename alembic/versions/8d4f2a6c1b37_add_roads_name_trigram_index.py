@@ -0,0 +1,31 @@
+"""add roads name trigram index
+
+Revision ID: 8d4f2a6c1b37
+Revises: 5c1e7b2d9f40
+Create Date: 2025-10-03 16:42:09.118604
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '8d4f2a6c1b37'
+down_revision: Union[str, Sequence[str], None] = '5c1e7b2d9f40'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.execute("CREATE EXTENSION IF NOT EXISTS pg_trgm")
+    op.create_index('ix_roads_name_trgm', 'roads', ['name'], unique=False,
+                    postgresql_using='gin', postgresql_ops={'name': 'gin_trgm_ops'})
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    # Расширение pg_trgm не удаляем: его могут использовать другие объекты БД
+    op.drop_index('ix_roads_name_trgm', table_name='roads', postgresql_using='gin')
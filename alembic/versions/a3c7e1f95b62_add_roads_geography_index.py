@@ -0,0 +1,29 @@
+"""add roads geography index
+
+Revision ID: a3c7e1f95b62
+Revises: f2b8d6e4a190
+Create Date: 2025-10-11 10:42:13.061587
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'a3c7e1f95b62'
+down_revision: Union[str, Sequence[str], None] = 'f2b8d6e4a190'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_index('idx_roads_geog', 'roads', [sa.text('(geom::geography)')],
+                    unique=False, postgresql_using='gist')
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index('idx_roads_geog', table_name='roads', postgresql_using='gist')
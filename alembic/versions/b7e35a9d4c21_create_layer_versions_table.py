@@ -0,0 +1,33 @@
+"""create layer_versions table
+
+Revision ID: b7e35a9d4c21
+Revises: 8d4f2a6c1b37
+Create Date: 2025-10-06 10:21:53.804417
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'b7e35a9d4c21'
+down_revision: Union[str, Sequence[str], None] = '8d4f2a6c1b37'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_table('layer_versions',
+    sa.Column('layer', sa.String(length=50), nullable=False),
+    sa.Column('version', sa.BigInteger(), nullable=False),
+    sa.Column('updated_at', sa.DateTime(timezone=True), server_default=sa.text('now()'), nullable=False),
+    sa.PrimaryKeyConstraint('layer')
+    )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_table('layer_versions')
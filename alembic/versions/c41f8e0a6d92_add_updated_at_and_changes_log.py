@@ -0,0 +1,47 @@
+"""add updated_at and changes log
+
+Revision ID: c41f8e0a6d92
+Revises: b7e35a9d4c21
+Create Date: 2025-10-08 14:05:37.266190
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'c41f8e0a6d92'
+down_revision: Union[str, Sequence[str], None] = 'b7e35a9d4c21'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.add_column('roads', sa.Column('updated_at', sa.DateTime(timezone=True), server_default=sa.text('now()'), nullable=True))
+    op.add_column('documents', sa.Column('updated_at', sa.DateTime(timezone=True), server_default=sa.text('now()'), nullable=True))
+
+    op.create_table('changes',
+    sa.Column('version', sa.BigInteger(), autoincrement=True, nullable=False),
+    sa.Column('layer', sa.String(length=50), nullable=False),
+    sa.Column('item_id', sa.Integer(), nullable=False),
+    sa.Column('operation', sa.String(length=10), nullable=False),
+    sa.Column('changed_at', sa.DateTime(timezone=True), server_default=sa.text('now()'), nullable=False),
+    sa.PrimaryKeyConstraint('version')
+    )
+
+    # Существующие объекты попадают в журнал, чтобы since=0 возвращал все данные
+    for layer in ('roads', 'crosswalks', 'documents'):
+        op.execute(
+            f"INSERT INTO changes (layer, item_id, operation) "
+            f"SELECT '{layer}', id, 'upsert' FROM {layer} ORDER BY id"
+        )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_table('changes')
+    op.drop_column('documents', 'updated_at')
+    op.drop_column('roads', 'updated_at')
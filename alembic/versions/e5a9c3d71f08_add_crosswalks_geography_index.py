@@ -0,0 +1,29 @@
+"""add crosswalks geography index
+
+Revision ID: e5a9c3d71f08
+Revises: c41f8e0a6d92
+Create Date: 2025-10-09 11:18:47.530214
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'e5a9c3d71f08'
+down_revision: Union[str, Sequence[str], None] = 'c41f8e0a6d92'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_index('idx_crosswalks_geog', 'crosswalks', [sa.text('(geom::geography)')],
+                    unique=False, postgresql_using='gist')
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index('idx_crosswalks_geog', table_name='crosswalks', postgresql_using='gist')
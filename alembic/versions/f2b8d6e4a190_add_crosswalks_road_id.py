@@ -0,0 +1,47 @@
+"""add crosswalks road_id
+
+Revision ID: f2b8d6e4a190
+Revises: e5a9c3d71f08
+Create Date: 2025-10-10 15:02:51.804377
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'f2b8d6e4a190'
+down_revision: Union[str, Sequence[str], None] = 'e5a9c3d71f08'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+# Максимальное расстояние привязки перехода к дороге, м (settings.CROSSWALK_SNAP_MAX_DISTANCE_M)
+SNAP_MAX_DISTANCE_M = 50
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.add_column('crosswalks', sa.Column('road_id', sa.Integer(), nullable=True))
+    op.create_foreign_key('crosswalks_road_id_fkey', 'crosswalks', 'roads', ['road_id'], ['id'], ondelete='SET NULL')
+    op.create_index(op.f('ix_crosswalks_road_id'), 'crosswalks', ['road_id'], unique=False)
+
+    # Привязываем существующие переходы к ближайшей дороге (KNN по idx_roads_geom)
+    op.execute(f"""
+        UPDATE crosswalks c
+        SET road_id = nearest.id
+        FROM crosswalks t
+        CROSS JOIN LATERAL (
+            SELECT r.id, r.geom FROM roads r ORDER BY r.geom <-> t.geom LIMIT 1
+        ) nearest
+        WHERE c.id = t.id
+          AND ST_DWithin(nearest.geom::geography, t.geom::geography, {SNAP_MAX_DISTANCE_M})
+    """)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index(op.f('ix_crosswalks_road_id'), table_name='crosswalks')
+    op.drop_constraint('crosswalks_road_id_fkey', 'crosswalks', type_='foreignkey')
+    op.drop_column('crosswalks', 'road_id')
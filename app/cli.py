@@ -0,0 +1,50 @@
+import argparse
+import asyncio
+import json
+
+from app.db.session import AsyncSessionLocal
+from app import road_import
+from app.crud import road_service
+
+
+async def import_roads(path: str, fmt: str = None):
+    fmt = fmt or road_import.detect_format(path)
+    async with AsyncSessionLocal() as db:
+        with open(path, 'rb') as file:
+            report = await road_import.import_roads_file(db, file, fmt)
+        await db.commit()
+    print(json.dumps(report, ensure_ascii=False, indent=2))
+
+
+async def snap_crosswalks():
+    async with AsyncSessionLocal() as db:
+        # Блокировка журнала до UPDATE: параллельные записи ждут, а не взаимоблокируются
+        await road_service.lock_changes(db)
+        changed = await road_service.snap_crosswalks(db)
+        if changed:
+            # Кэши процессов API сбросятся по NOTIFY после commit
+            await road_service.record_snapped_crosswalks(db, changed)
+        await db.commit()
+    print(json.dumps({'snapped': len(changed)}))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Служебные команды Интерактивной карты дорог")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    import_parser = commands.add_parser("import-roads", help="Массовый импорт дорог из CSV/GeoJSON")
+    import_parser.add_argument("path", help="Путь к файлу")
+    import_parser.add_argument("--format", choices=sorted(set(road_import.IMPORT_FORMATS.values())),
+                               help="Формат файла (по умолчанию по расширению)")
+
+    commands.add_parser("snap-crosswalks", help="Привязать все переходы к ближайшим дорогам")
+
+    args = parser.parse_args()
+    if args.command == "import-roads":
+        asyncio.run(import_roads(args.path, args.format))
+    elif args.command == "snap-crosswalks":
+        asyncio.run(snap_crosswalks())
+
+
+if __name__ == "__main__":
+    main()
@@ -1,12 +1,83 @@
 import os
 from pathlib import Path
+from uuid import uuid4
+
+
+def env_bool(name: str, default: bool) -> bool:
+    value = os.getenv(name)
+    return default if value is None else value.strip().lower() in ('1', 'true', 'yes', 'on')
 
 
 class Settings:
+    # Движок БД и пул соединений (переменные окружения DB_*)
+    DB_ECHO: bool = env_bool("DB_ECHO", False)  # логировать каждый SQL запрос
+    DB_POOL_SIZE: int = int(os.getenv("DB_POOL_SIZE", 10))
+    DB_MAX_OVERFLOW: int = int(os.getenv("DB_MAX_OVERFLOW", 20))
+    DB_POOL_TIMEOUT: float = float(os.getenv("DB_POOL_TIMEOUT", 30))  # секунд ожидания свободного соединения
+    DB_POOL_RECYCLE: int = int(os.getenv("DB_POOL_RECYCLE", 1800))  # секунд жизни соединения, -1 - без ограничения
+    DB_STATEMENT_CACHE_SIZE: int = int(os.getenv("DB_STATEMENT_CACHE_SIZE", 100))  # подготовленных запросов на соединение
+    # PgBouncer в режиме transaction: без кэша подготовленных запросов и с уникальными именами
+    DB_PGBOUNCER: bool = env_bool("DB_PGBOUNCER", False)
+
     # Локальное хранилище
     LOCAL_STORAGE_PATH: str = "uploads/documents"
     MAX_FILE_SIZE: int = 50 * 1024 * 1024  # 50MB
 
+    # Максимальное число объектов в ответе на запрос по bbox
+    MAX_BBOX_FEATURES: int = 5000
+
+    # Векторные тайлы
+    TILE_CACHE_PATH: str = "cache/tiles"
+    TILE_MAX_ZOOM: int = 22
+    TILE_CACHE_MAX_ZOOM: int = 18  # тайлы крупнее этого зума не кэшируются
+    TILE_EXTENT: int = 4096
+    TILE_BUFFER: int = 256
+    # Удаление объектов кэша тайлов без ключей: период и минимальный возраст объекта
+    TILE_CACHE_SWEEP_INTERVAL: int = 600  # секунд
+    TILE_CACHE_SWEEP_GRACE: int = 60  # секунд
+
+    # Потоковая выдача слоев: строк на одну выборку курсора и на один чанк ответа
+    STREAM_BATCH_SIZE: int = 1000
+
+    # Кэш готовых ответов в памяти процесса
+    RESPONSE_CACHE_MAX_ENTRIES: int = 1024
+    RESPONSE_CACHE_MAX_BYTES: int = 256 * 1024 * 1024  # 256MB
+    RESPONSE_CACHE_MAX_ENTRY_BYTES: int = 64 * 1024 * 1024  # 64MB
+    RESPONSE_CACHE_TTL: int = 300  # секунд
+
+    # Сжатие ответов (gzip, brotli при установленном пакете brotli)
+    COMPRESSION_MIN_SIZE: int = 1024  # байт, меньшие ответы не сжимаются
+    GZIP_LEVEL: int = 6
+    BROTLI_QUALITY: int = 5
+
+    # Максимум переходов в каждом списке (create/update/delete) пакетного запроса
+    CROSSWALK_BATCH_MAX_SIZE: int = 5000
+
+    # Массовый импорт дорог: записей на одну проверку и один COPY
+    IMPORT_BATCH_SIZE: int = 5000
+
+    # Реплика дорог в памяти процесса (STRtree): включена ли и после скольких
+    # изменений поверх дерева оно пересобирается
+    ROAD_INDEX_ENABLED: bool = True
+    ROAD_INDEX_REBUILD_THRESHOLD: int = 500
+
+    # Привязка перехода к дороге: ближайшая дорога не дальше этого расстояния
+    CROSSWALK_SNAP_MAX_DISTANCE_M: float = 50
+
+    # Кластеры переходов: до какого зума включительно отдаются кластеры
+    # вместо отдельных переходов и размер ячейки сетки в пикселях экрана
+    CROSSWALK_CLUSTER_MAX_ZOOM: int = 15
+    CROSSWALK_CLUSTER_CELL_PX: int = 64
+
+    # Реплики для чтения (DATABASE_REPLICA_URLS): период и таймаут проверки,
+    # допустимое отставание от основной БД
+    REPLICA_HEALTH_INTERVAL: float = 5  # секунд
+    REPLICA_HEALTH_TIMEOUT: float = 2  # секунд
+    REPLICA_MAX_LAG_SECONDS: float = 5
+    # После изменения данных клиент читает с основной БД, пока жива эта кука
+    READ_PRIMARY_COOKIE: str = "read_primary"
+    READ_PRIMARY_STICKY_SECONDS: int = 10
+
     # Разрешенные MIME types
     ALLOWED_MIME_TYPES: list = [
         'application/pdf',
@@ -20,9 +91,30 @@ class Settings:
         'text/plain'
     ]
 
+    def engine_options(self) -> dict:
+        """Аргументы create_async_engine для основной БД и реплик"""
+        connect_args = {'prepared_statement_cache_size': self.DB_STATEMENT_CACHE_SIZE}
+        if self.DB_PGBOUNCER:
+            # Соединение с сервером меняется между транзакциями, подготовленный
+            # запрос может не найтись или совпасть по имени с чужим
+            connect_args = {
+                'prepared_statement_cache_size': 0,
+                'statement_cache_size': 0,
+                'prepared_statement_name_func': lambda: f"__asyncpg_{uuid4()}__",
+            }
+        return {
+            'echo': self.DB_ECHO,
+            'pool_size': self.DB_POOL_SIZE,
+            'max_overflow': self.DB_MAX_OVERFLOW,
+            'pool_timeout': self.DB_POOL_TIMEOUT,
+            'pool_recycle': self.DB_POOL_RECYCLE,
+            'connect_args': connect_args,
+        }
+
     def __init__(self):
         # Создаем директорию для локального хранения
         Path(self.LOCAL_STORAGE_PATH).mkdir(parents=True, exist_ok=True)
+        Path(self.TILE_CACHE_PATH).mkdir(parents=True, exist_ok=True)
 
 
 settings = Settings()
\ No newline at end of file
@@ -1,10 +1,215 @@
 from geoalchemy2.functions import ST_GeomFromText
 from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy import select, func, delete
-from app.models.models import Road, Document, Crosswalk
-from app.schemas.schemas import RoadCreate, convert_db_geom_to_wkt, CrosswalkCreate, CrosswalkUpdate
+from sqlalchemy import select, insert, update, func, delete, text
+from sqlalchemy.orm import defer, joinedload
+from app.models.models import Road, Document, LayerVersion
+from app.schemas.schemas import RoadCreate, CrosswalkCreate, CrosswalkUpdate
+from app.config import settings
+from app.tile_cache import tile_cache
+from app.road_index import road_index
+from app.response_cache import response_cache, list_tag, item_tag
+from app.geometry_validation import (
+    ROAD_GEOMETRY_TYPES, CROSSWALK_GEOMETRY_TYPES, GeometryValidationError,
+    validate_geometry, validate_geometries,
+)
 from geoalchemy2 import WKTElement
+import json
+import math
+import shapely
 
+# Атрибуты, которые попадают в векторные тайлы для каждого слоя
+TILE_LAYERS = {
+    'roads': 'id, name',
+    'crosswalks': 'id, name, width, has_traffic_light, near_educational_institution, has_t7',
+}
+
+
+# Канал NOTIFY, по которому процессы API узнают об изменениях (см. app.notifications)
+CHANGES_CHANNEL = 'map_changes'
+
+
+def geometry_bounds(*wkts: str) -> list:
+    """Охваты геометрий для сброса тайлов; None, если охват определить не удалось"""
+    bounds = []
+    for wkt in wkts:
+        if not wkt:
+            continue
+        try:
+            geometry = shapely.from_wkt(wkt)
+        except shapely.errors.GEOSException:
+            bounds.append(None)
+            continue
+        if not geometry.is_empty:
+            bounds.append(list(geometry.bounds))
+    return bounds
+
+
+def geometry_extent(*wkts: str) -> str:
+    """Общий охват геометрий в виде WKT прямоугольника (для одного NOTIFY на пачку)"""
+    geometries = shapely.from_wkt([wkt for wkt in wkts if wkt], on_invalid='ignore')
+    geometries = geometries[~shapely.is_missing(geometries)]
+    if len(geometries) == 0:
+        return None
+    return shapely.box(*shapely.total_bounds(geometries)).wkt
+
+
+async def bump_layer_version(db: AsyncSession, layer: str) -> tuple:
+    """Увеличить версию слоя в текущей транзакции записи; возвращает (версия, updated_at)"""
+    result = await db.execute(
+        text("""
+            INSERT INTO layer_versions (layer, version, updated_at)
+            VALUES (:layer, 1, now())
+            ON CONFLICT (layer) DO UPDATE
+            SET version = layer_versions.version + 1, updated_at = now()
+            RETURNING version, updated_at
+        """),
+        {"layer": layer}
+    )
+    return tuple(result.one())
+
+
+async def get_layer_versions(db: AsyncSession, layers) -> dict:
+    """Текущие версии слоев: {layer: (version, updated_at)}"""
+    result = await db.execute(
+        select(LayerVersion.layer, LayerVersion.version, LayerVersion.updated_at)
+        .where(LayerVersion.layer.in_(layers))
+    )
+    versions = {layer: (0, None) for layer in layers}
+    for row in result:
+        versions[row.layer] = (row.version, row.updated_at)
+    return versions
+
+
+# Ключ advisory-блокировки, которая упорядочивает записи в журнал changes
+CHANGES_LOCK_KEY = 7340021
+
+
+async def lock_changes(db: AsyncSession):
+    """Advisory-блокировка журнала changes до конца транзакции.
+
+    Версии в changes выдаются в порядке commit, и клиент с since=N
+    не пропустит более раннюю запись.
+
+    Порядок блокировок во всех записях: сначала эта блокировка, затем
+    блокировки строк (INSERT/UPDATE/DELETE, перепривязка переходов,
+    каскады внешних ключей). Запись, которая сначала заблокирует строку,
+    а потом будет ждать журнал, взаимоблокируется с записью, держащей
+    журнал и ждущей эту строку.
+    """
+    await db.execute(text("SELECT pg_advisory_xact_lock(:key)"), {"key": CHANGES_LOCK_KEY})
+
+
+async def record_change(db: AsyncSession, layer: str, item_id: int, *wkts: str,
+                        operation: str = 'upsert') -> dict:
+    """Зафиксировать изменение объекта в транзакции записи.
+
+    Пишет строку в журнал changes, увеличивает версию слоя и отправляет
+    NOTIFY; остальные процессы получат его только после commit.
+    item_id=None означает массовое изменение слоя, строки журнала для
+    него пишет вызывающий код. Возвращает описание изменения для apply_change.
+    """
+    change = {'table': layer, 'id': item_id, 'bounds': geometry_bounds(*wkts)}
+    await lock_changes(db)
+    if item_id is not None:
+        await db.execute(
+            text("INSERT INTO changes (layer, item_id, operation) VALUES (:layer, :item_id, :operation)"),
+            {"layer": layer, "item_id": item_id, "operation": operation}
+        )
+    # Версия слоя в уведомлении: по ней реплики в памяти понимают, догнали ли они БД,
+    # и отдают ETag/Last-Modified без обращения к БД
+    version, updated_at = await bump_layer_version(db, layer)
+    change['version'] = version
+    change['updated_at'] = updated_at.isoformat()
+    await db.execute(
+        text("SELECT pg_notify(:channel, :payload)"),
+        {"channel": CHANGES_CHANNEL, "payload": json.dumps(change)}
+    )
+    return change
+
+
+def apply_change(change: dict):
+    """Сбросить локальные кэши по изменению: своему после commit или пришедшему по NOTIFY"""
+    layer = change['table']
+    if change.get('id') is None:
+        # Массовое изменение слоя
+        response_cache.invalidate(list_tag(layer), layer)
+    else:
+        response_cache.invalidate(list_tag(layer), item_tag(layer, change['id']))
+
+    for bounds in change.get('bounds', []):
+        if bounds is None:
+            tile_cache.clear_layer(layer)
+        else:
+            tile_cache.invalidate(layer, tuple(bounds))
+
+    road_index.apply_change(change)
+
+
+# Уровни упрощения геометрии дорог: (максимальный зум, допуск в градусах, колонка).
+# Допуск примерно равен размеру пикселя на этом зуме, поэтому разница не видна.
+ROAD_GEOM_LEVELS = (
+    (8, 0.005, Road.geom_z8),
+    (11, 0.0005, Road.geom_z11),
+    (14, 0.00005, Road.geom_z14),
+)
+
+
+def road_geom_level(zoom: int = None, tolerance: float = None):
+    """Уровень упрощения (допуск, колонка) под зум карты или допуск; None - исходная геометрия"""
+    for max_zoom, level_tolerance, column in ROAD_GEOM_LEVELS:
+        if (zoom is not None and zoom <= max_zoom) or (tolerance is not None and tolerance >= level_tolerance):
+            return level_tolerance, column
+    return None
+
+
+def road_geom_column(zoom: int = None, tolerance: float = None):
+    """Выбрать колонку геометрии дороги под зум карты или допуск упрощения"""
+    level = road_geom_level(zoom, tolerance)
+    if level is None:
+        return Road.geom
+    # Для строк без заполненного уровня берем исходную геометрию
+    return func.coalesce(level[1], Road.geom)
+
+
+def simplified_geoms(geom_wkt: str) -> dict:
+    """Значения упрощенных колонок для новой геометрии дороги"""
+    geom = ST_GeomFromText(geom_wkt, 4326)
+    return {
+        column.key: func.ST_SimplifyPreserveTopology(geom, tolerance)
+        for _, tolerance, column in ROAD_GEOM_LEVELS
+    }
+
+
+# Функции PostGIS для сериализации геометрии в ответ и точность
+# по умолчанию (знаков после запятой; у encoded polyline - множитель 10^n)
+GEOM_FORMATS = {
+    'wkt': ('ST_AsText', 15),
+    'geojson': ('ST_AsGeoJSON', 9),
+    'polyline': ('ST_AsEncodedPolyline', 5),
+    'wkb': ('ST_AsBinary', None),
+}
+
+
+def geom_output_sql(column: str = 'geom', geom_format: str = 'wkt', precision: int = None) -> str:
+    """SQL сериализации геометрии для текстовых запросов"""
+    function, default_precision = GEOM_FORMATS[geom_format]
+    if geom_format == 'polyline':
+        # Encoded polyline строится из LINESTRING или MULTIPOINT
+        column = f"CASE WHEN GeometryType({column}) = 'POINT' THEN ST_Multi({column}) ELSE {column} END"
+    if default_precision is None:
+        return f"{function}({column})"
+    return f"{function}({column}, {int(default_precision if precision is None else precision)})"
+
+
+def select_roads(zoom: int = None, tolerance: float = None, geom_format: str = 'wkt', precision: int = None):
+    """Запрос id, name и геометрии дорог нужного уровня детализации.
+
+    Геометрия сериализуется в PostGIS, без декодирования WKB в Python.
+    """
+    function, default_precision = GEOM_FORMATS[geom_format]
+    as_format = getattr(func, function)
+    args = () if default_precision is None else (default_precision if precision is None else precision,)
+    return select(Road.id, Road.name, as_format(road_geom_column(zoom, tolerance), *args).label('geom'))
 
 
 async def get_roads_count(db: AsyncSession) -> int:
@@ -13,62 +218,206 @@ async def get_roads_count(db: AsyncSession) -> int:
     return result.scalar()
 
 
-async def get_all_roads(db: AsyncSession):
-    """Получить все дороги без ограничений"""
-    result = await db.execute(select(Road))
-    roads = result.scalars().all()
+async def get_roads_count_estimate(db: AsyncSession) -> int:
+    """Оценка количества дорог по статистике планировщика (pg_class.reltuples)"""
+    result = await db.execute(
+        text("SELECT reltuples::bigint FROM pg_class WHERE oid = 'roads'::regclass")
+    )
+    estimate = result.scalar()
+    # Для таблицы без ANALYZE статистики нет (reltuples = -1)
+    if estimate is None or estimate < 0:
+        return await get_roads_count(db)
+    return estimate
 
-    # Преобразуем геометрию для ответа
-    return [await road_to_dict(road) for road in roads]
 
+async def get_all_roads(db: AsyncSession, zoom: int = None, tolerance: float = None):
+    """Получить все дороги без ограничений"""
+    result = await db.execute(select_roads(zoom, tolerance))
+    return result.mappings().all()
 
-async def road_to_dict(db_road):
-    """Преобразует объект Road из БД в словарь"""
-    if not db_road:
-        return None
 
-    return {
-        'id': db_road.id,
-        'name': db_road.name,
-        'geom': convert_db_geom_to_wkt(db_road.geom)
-    }
+# Колонки дороги в ответах на запись (INSERT/UPDATE/DELETE ... RETURNING)
+ROAD_RETURNING = (Road.id, Road.name, func.ST_AsText(Road.geom).label('geom'))
 
 
 async def create_road(db: AsyncSession, road_in: RoadCreate):
-    """Создать дорогу"""
-    # Проверяем, что WKT валидный LINESTRING
-    if not road_in.geom.startswith('LINESTRING'):
-        raise ValueError("Geometry must be a LINESTRING")
+    """Создать дорогу: INSERT ... RETURNING без повторного чтения строки"""
+    validate_geometry(road_in.geom, ROAD_GEOMETRY_TYPES)
+
+    # Журнал блокируется до записи: перепривязка ниже блокирует строки переходов
+    await lock_changes(db)
+    result = await db.execute(
+        insert(Road)
+        .values(
+            name=road_in.name,
+            geom=WKTElement(road_in.geom, srid=4326),
+            **simplified_geoms(road_in.geom)
+        )
+        .returning(*ROAD_RETURNING)
+    )
+    road = dict(result.mappings().one())
+    change = await record_change(db, 'roads', road['id'], road_in.geom)
+    crosswalks_change = await resnap_crosswalks(db, near_wkt=road_in.geom)
+    await db.commit()
+    apply_change(change)
+    if crosswalks_change:
+        apply_change(crosswalks_change)
+    return road
 
-    # Проверяем, что есть минимум 2 точки
-    if 'EMPTY' in road_in.geom or road_in.geom.count(',') < 1:
-        raise ValueError("LINESTRING must have at least 2 points")
 
-    geom = WKTElement(road_in.geom, srid=4326)
+async def create_roads_staging(db: AsyncSession):
+    """Временная таблица для массового импорта дорог, удаляется при commit"""
+    await db.execute(text("""
+        CREATE TEMP TABLE roads_import (
+            line integer,
+            name varchar(255),
+            geom_wkb bytea
+        ) ON COMMIT DROP
+    """))
 
-    db_road = Road(
-        name=road_in.name,
-        geom=geom
+
+async def copy_roads_to_staging(db: AsyncSession, rows: list):
+    """Загрузить проверенные строки (line, name, wkb) в roads_import через COPY"""
+    connection = await db.connection()
+    raw_connection = await connection.get_raw_connection()
+    await raw_connection.driver_connection.copy_records_to_table(
+        'roads_import', records=rows, columns=['line', 'name', 'geom_wkb']
     )
 
-    db.add(db_road)
+
+async def merge_staged_roads(db: AsyncSession, bounds: list) -> int:
+    """Перенести дороги из roads_import в roads одним запросом и записать журнал"""
+    await lock_changes(db)
+    columns = ", ".join(column.key for _, _, column in ROAD_GEOM_LEVELS)
+    simplified = ", ".join(f"ST_SimplifyPreserveTopology(g, {tolerance})" for _, tolerance, _ in ROAD_GEOM_LEVELS)
+    result = await db.execute(text(f"""
+        WITH inserted AS (
+            INSERT INTO roads (name, geom, {columns})
+            SELECT name, g, {simplified}
+            FROM (
+                SELECT line, name, ST_SetSRID(ST_GeomFromWKB(geom_wkb), 4326) AS g
+                FROM roads_import
+            ) staged
+            ORDER BY line
+            RETURNING id
+        )
+        INSERT INTO changes (layer, item_id, operation)
+        SELECT 'roads', id, 'upsert' FROM inserted
+    """))
+    imported = result.rowcount
+
+    change = await record_change(db, 'roads', None, shapely.box(*bounds).wkt)
+    crosswalks_change = await resnap_crosswalks(db, near_wkt=shapely.box(*bounds).wkt)
     await db.commit()
-    await db.refresh(db_road)
-    return await road_to_dict(db_road)
+    apply_change(change)
+    if crosswalks_change:
+        apply_change(crosswalks_change)
+    return imported
 
 
 async def get_road(db: AsyncSession, road_id: int):
     """Получить дорогу по ID"""
-    result = await db.execute(select(Road).where(Road.id == road_id))
-    db_road = result.scalar_one_or_none()
-    return await road_to_dict(db_road) if db_road else None
+    result = await db.execute(select_roads().where(Road.id == road_id))
+    return result.mappings().first()
+
+
+async def get_roads(db: AsyncSession, skip: int = 0, limit: int = 100,
+                    zoom: int = None, tolerance: float = None, after_id: int = None,
+                    geom_format: str = 'wkt', precision: int = None):
+    """Получить список дорог с пагинацией.
+
+    Если передан after_id, используется keyset-пагинация по id вместо OFFSET.
+    """
+    stmt = select_roads(zoom, tolerance, geom_format, precision).order_by(Road.id)
+    if after_id is not None:
+        stmt = stmt.where(Road.id > after_id)
+    else:
+        stmt = stmt.offset(skip)
+
+    result = await db.execute(stmt.limit(limit))
+    return result.mappings().all()
+
+
+async def get_roads_in_bbox(db: AsyncSession, bbox: tuple, limit: int = 1000,
+                            zoom: int = None, tolerance: float = None,
+                            geom_format: str = 'wkt', precision: int = None):
+    """Получить дороги, пересекающие прямоугольник bbox (minx, miny, maxx, maxy)"""
+    envelope = func.ST_MakeEnvelope(*bbox, 4326)
+    # ST_Intersects использует GiST индекс idx_roads_geom (неявный оператор &&)
+    stmt = (
+        select_roads(zoom, tolerance, geom_format, precision)
+        .where(func.ST_Intersects(Road.geom, envelope))
+        .order_by(Road.id)
+        .limit(limit)
+    )
+    result = await db.execute(stmt)
+    return result.mappings().all()
 
 
-async def get_roads(db: AsyncSession, skip: int = 0, limit: int = 100):
-    """Получить список дорог с пагинацией"""
-    result = await db.execute(select(Road).offset(skip).limit(limit))
-    roads = result.scalars().all()
-    return [await road_to_dict(road) for road in roads]
+async def get_nearest_roads(db: AsyncSession, lon: float, lat: float, k: int = 5):
+    """k ближайших к точке дорог с расстоянием в метрах.
+
+    KNN-оператор <-> на geography (индекс idx_roads_geog) упорядочивает
+    дороги по расстоянию на сфере, как RoadIndex.nearest; расстояние
+    в ответе считается так же (без сфероида), поэтому порядок совпадает.
+    """
+    result = await db.execute(
+        text("""
+            WITH point AS (SELECT ST_SetSRID(ST_MakePoint(:lon, :lat), 4326)::geography AS geog)
+            SELECT nearest.id, nearest.name, ST_AsText(nearest.geom) AS geom, nearest.distance_m
+            FROM point, LATERAL (
+                SELECT id, name, geom, ST_Distance(roads.geom::geography, point.geog, false) AS distance_m
+                FROM roads
+                ORDER BY roads.geom::geography <-> point.geog
+                LIMIT :k
+            ) nearest
+            ORDER BY nearest.distance_m, nearest.id
+        """),
+        {"lon": lon, "lat": lat, "k": k}
+    )
+    return result.mappings().all()
+
+
+async def get_roads_near_point(db: AsyncSession, lon: float, lat: float, radius_m: float, limit: int = 100):
+    """Дороги не дальше radius_m метров от точки, ближайшие первыми"""
+    # geom && ST_Expand отбирает кандидатов по idx_roads_geom, ST_DWithin
+    # на geography проверяет точное расстояние
+    radius_deg = radius_m / (111320 * max(math.cos(math.radians(lat)), 0.01))
+    result = await db.execute(
+        text("""
+            WITH point AS (SELECT ST_SetSRID(ST_MakePoint(:lon, :lat), 4326) AS geom)
+            SELECT r.id, r.name, ST_AsText(r.geom) AS geom,
+                   ST_Distance(r.geom::geography, point.geom::geography) AS distance_m
+            FROM roads r, point
+            WHERE r.geom && ST_Expand(point.geom, :radius_deg)
+              AND ST_DWithin(r.geom::geography, point.geom::geography, :radius_m)
+            ORDER BY distance_m, r.id
+            LIMIT :limit
+        """),
+        {"lon": lon, "lat": lat, "radius_m": radius_m, "radius_deg": radius_deg, "limit": limit}
+    )
+    return result.mappings().all()
+
+
+async def get_road_with_documents(db: AsyncSession, road_id: int):
+    """Получить дорогу вместе с документами одним запросом"""
+    stmt = (
+        select(Road, func.ST_AsText(Road.geom).label('geom_wkt'))
+        .options(defer(Road.geom), joinedload(Road.documents))
+        .where(Road.id == road_id)
+    )
+    result = await db.execute(stmt)
+    row = result.unique().first()
+    if not row:
+        return None
+
+    road, geom_wkt = row
+    return {
+        'id': road.id,
+        'name': road.name,
+        'geom': geom_wkt,
+        'documents': road.documents
+    }
 
 
 async def get_documents_for_road(db: AsyncSession, road_id: int):
@@ -78,58 +427,154 @@ async def get_documents_for_road(db: AsyncSession, road_id: int):
 
 
 async def delete_road(db: AsyncSession, road_id: int):
-    """Удалить дорогу"""
-    result = await db.execute(select(Road).where(Road.id == road_id))
-    road = result.scalar_one_or_none()
-    if road:
-        await db.delete(road)
-        await db.commit()
-        return await road_to_dict(road)
-    return None
+    """Удалить дорогу одним DELETE ... RETURNING"""
+    # Блокировка до записи документов в журнал, см. lock_changes
+    await lock_changes(db)
+    # Документы удалятся каскадно; CTE видит их в снимке до удаления
+    # и записывает в журнал тем же запросом. Так же берутся переходы
+    # этой дороги: их road_id обнулит ON DELETE SET NULL.
+    result = await db.execute(
+        text("""
+            WITH deleted AS (
+                DELETE FROM roads WHERE id = :road_id
+                RETURNING id, name, ST_AsText(geom) AS geom
+            ), documents_journal AS (
+                INSERT INTO changes (layer, item_id, operation)
+                SELECT 'documents', d.id, 'delete' FROM documents d JOIN deleted ON d.road_id = deleted.id
+            )
+            SELECT id, name, geom,
+                   ARRAY(SELECT c.id FROM crosswalks c WHERE c.road_id = :road_id) AS crosswalk_ids
+            FROM deleted
+        """),
+        {"road_id": road_id}
+    )
+    deleted = result.mappings().first()
+    if deleted is None:
+        return None
 
+    deleted = dict(deleted)
+    unlinked = deleted.pop('crosswalk_ids')
+    change = await record_change(db, 'roads', road_id, deleted['geom'], operation='delete')
+    # Переходы этой дороги ищут новую. Те, что остались без дороги
+    # (NULL -> NULL), snap_crosswalks не вернет, но road_id у них изменился.
+    changed = await snap_crosswalks(db, near_wkt=deleted['geom'])
+    changed = sorted(set(changed) | set(unlinked))
+    crosswalks_change = await record_snapped_crosswalks(db, changed) if changed else None
+    await bump_layer_version(db, 'documents')
+    await db.commit()
+    apply_change(change)
+    if crosswalks_change:
+        apply_change(crosswalks_change)
+    return deleted
 
-async def search_roads(db: AsyncSession, query: str = None, skip: int = 0, limit: int = 100):
-    """Поиск дорог по названию"""
-    stmt = select(Road)
+
+def name_contains(query: str):
+    """Условие ILIKE '%query%' с экранированием спецсимволов LIKE"""
+    escaped = query.replace('\\', '\\\\').replace('%', '\\%').replace('_', '\\_')
+    return Road.name.ilike(f"%{escaped}%", escape='\\')
+
+
+async def search_roads(db: AsyncSession, query: str = None, skip: int = 0, limit: int = 100,
+                       zoom: int = None, tolerance: float = None,
+                       after_id: int = None, after_rank: float = None,
+                       geom_format: str = 'wkt', precision: int = None):
+    """Поиск дорог по названию.
+
+    С запросом результаты ранжируются по триграммной похожести (rank),
+    ILIKE при этом обслуживается GIN индексом ix_roads_name_trgm.
+    """
+    stmt = select_roads(zoom, tolerance, geom_format, precision)
 
     if query:
-        stmt = stmt.where(Road.name.ilike(f"%{query}%"))
+        rank = func.similarity(Road.name, query)
+        stmt = stmt.add_columns(rank.label('rank')).where(name_contains(query))
+        stmt = stmt.order_by(rank.desc(), Road.id)
+        if after_id is not None:
+            stmt = stmt.where((rank < after_rank) | ((rank == after_rank) & (Road.id > after_id)))
+    else:
+        stmt = stmt.order_by(Road.id)
+        if after_id is not None:
+            stmt = stmt.where(Road.id > after_id)
+
+    if after_id is None:
+        stmt = stmt.offset(skip)
+
+    stmt = stmt.limit(limit)
 
-    stmt = stmt.offset(skip).limit(limit)
+    result = await db.execute(stmt)
+    return result.mappings().all()
 
+
+async def autocomplete_roads(db: AsyncSession, query: str, limit: int = 10):
+    """Подсказки названий дорог: только id и name, без геометрии"""
+    stmt = (
+        select(Road.id, Road.name)
+        .where(name_contains(query))
+        .order_by(
+            Road.name.istartswith(query, autoescape=True).desc(),
+            func.similarity(Road.name, query).desc(),
+            Road.name,
+        )
+        .limit(limit)
+    )
     result = await db.execute(stmt)
-    roads = result.scalars().all()
-    return [await road_to_dict(road) for road in roads]
+    return result.mappings().all()
 
 
 async def update_road(db: AsyncSession, road_id: int, road_data: dict):
-    """Обновить информацию о дороге"""
-    result = await db.execute(select(Road).where(Road.id == road_id))
-    road = result.scalar_one_or_none()
+    """Обновить информацию о дороге одним UPDATE ... RETURNING.
 
-    if not road:
-        return None
+    Старая геометрия (для сброса тайлов на старом месте) берется из снимка
+    строки в том же запросе.
+    """
+    if road_data.get('geom'):
+        validate_geometry(road_data['geom'], ROAD_GEOMETRY_TYPES)
+
+    values = {
+        key: value for key, value in road_data.items()
+        if key in Road.__table__.c and key not in ('id', 'geom')
+    }
+    if road_data.get('geom'):
+        values['geom'] = WKTElement(road_data['geom'], srid=4326)
+        values.update(simplified_geoms(road_data['geom']))
+    values['updated_at'] = func.now()
 
-    # Обновляем поля
-    for key, value in road_data.items():
-        if hasattr(road, key) and key != 'id':
-            if key == 'geom' and value:
-                setattr(road, key, WKTElement(value, srid=4326))
-            else:
-                setattr(road, key, value)
+    # Журнал блокируется до записи: перепривязка ниже блокирует строки переходов
+    await lock_changes(db)
+    old = Road.__table__.alias('old')
+    result = await db.execute(
+        update(Road)
+        .where(Road.id == road_id, old.c.id == Road.id)
+        .values(**values)
+        .returning(*ROAD_RETURNING, func.ST_AsText(old.c.geom).label('old_geom'))
+        .execution_options(synchronize_session=False)
+    )
+    road = result.mappings().first()
+    if road is None:
+        return None
 
+    road = dict(road)
+    old_wkt = road.pop('old_geom')
+    change = await record_change(db, 'roads', road_id, old_wkt, road_data.get('geom'))
+    crosswalks_change = None
+    if road_data.get('geom'):
+        crosswalks_change = await resnap_crosswalks(db, near_wkt=geometry_collection(old_wkt, road_data['geom']))
     await db.commit()
-    await db.refresh(road)
-    return await road_to_dict(road)
+    apply_change(change)
+    if crosswalks_change:
+        apply_change(crosswalks_change)
+    return road
 
 
 # Новые функции для работы с документами (упрощенные)
 async def create_document(db: AsyncSession, document_data: dict) -> Document:
-    """Создать запись о документе в БД"""
-    document = Document(**document_data)
-    db.add(document)
+    """Создать запись о документе в БД (INSERT ... RETURNING)"""
+    # Порядок блокировок - см. lock_changes
+    await lock_changes(db)
+    document = await db.scalar(insert(Document).values(**document_data).returning(Document))
+    change = await record_change(db, 'documents', document.id)
     await db.commit()
-    await db.refresh(document)
+    apply_change(change)
     return document
 
 
@@ -141,22 +586,103 @@ async def get_document(db: AsyncSession, document_id: int) -> Document:
 
 async def delete_document(db: AsyncSession, document_id: int) -> bool:
     """Удалить документ"""
-    document = await get_document(db, document_id)
-    if not document:
+    await lock_changes(db)
+    deleted_id = await db.scalar(
+        delete(Document).where(Document.id == document_id).returning(Document.id)
+        .execution_options(synchronize_session=False)
+    )
+    if deleted_id is None:
         return False
 
-    await db.delete(document)
+    change = await record_change(db, 'documents', document_id, operation='delete')
     await db.commit()
+    apply_change(change)
     return True
 
 
+def nearest_road_sql(geom: str) -> str:
+    """Подзапрос id ближайшей дороги к геометрии geom (KNN по idx_roads_geom).
+
+    Дальше :max_m метров возвращает NULL.
+    """
+    return f"""(
+        SELECT CASE WHEN ST_DWithin(r.geom::geography, {geom}::geography, :max_m) THEN r.id END
+        FROM roads r ORDER BY r.geom <-> {geom} LIMIT 1
+    )"""
+
+
+async def snap_crosswalks(db: AsyncSession, crosswalk_ids: list = None, near_wkt: str = None) -> list:
+    """Привязать переходы к ближайшей дороге (crosswalks.road_id).
+
+    Ближайшая дорога ищется KNN-подзапросом (<-> по idx_roads_geom) для
+    каждого перехода; дальше CROSSWALK_SNAP_MAX_DISTANCE_M road_id = NULL.
+    Переходы выбираются по id, по близости к геометрии near_wkt или все,
+    если не задано ни то ни другое. Возвращает id переходов, у которых
+    road_id изменился.
+    """
+    if crosswalk_ids is not None:
+        where = "t.id = ANY(:ids)"
+    elif near_wkt is not None:
+        # Кандидаты по индексу idx_crosswalks_geog
+        where = "ST_DWithin(t.geom::geography, ST_GeomFromText(:near, 4326)::geography, :max_m)"
+    else:
+        where = "true"
+    result = await db.execute(
+        text(f"""
+            UPDATE crosswalks c
+            SET road_id = snapped.road_id
+            FROM (
+                SELECT t.id, {nearest_road_sql('t.geom')} AS road_id
+                FROM crosswalks t
+                WHERE {where}
+            ) snapped
+            WHERE c.id = snapped.id AND c.road_id IS DISTINCT FROM snapped.road_id
+            RETURNING c.id
+        """),
+        {"ids": crosswalk_ids, "near": near_wkt, "max_m": settings.CROSSWALK_SNAP_MAX_DISTANCE_M}
+    )
+    return list(result.scalars())
+
+
+async def resnap_crosswalks(db: AsyncSession, crosswalk_ids: list = None, near_wkt: str = None) -> dict:
+    """Перепривязать переходы и записать изменения в журнал (для записей в слой дорог).
+
+    Возвращает описание изменения для apply_change или None, если ни один
+    переход не поменял дорогу.
+    """
+    changed = await snap_crosswalks(db, crosswalk_ids, near_wkt)
+    if not changed:
+        return None
+    return await record_snapped_crosswalks(db, changed)
+
+
+async def record_snapped_crosswalks(db: AsyncSession, changed: list) -> dict:
+    """Записать в журнал переходы, у которых поменялась дорога"""
+    await lock_changes(db)
+    await db.execute(
+        text("""
+            INSERT INTO changes (layer, item_id, operation)
+            SELECT 'crosswalks', item_id, 'upsert' FROM unnest(CAST(:ids AS integer[])) AS item_id
+        """),
+        {"ids": changed}
+    )
+    # road_id не попадает в тайлы, поэтому сбрасываются только ответы API
+    return await record_change(db, 'crosswalks', None)
+
+
+def geometry_collection(*wkts: str) -> str:
+    """Объединить геометрии в один WKT GEOMETRYCOLLECTION"""
+    geometries = shapely.from_wkt([wkt for wkt in wkts if wkt], on_invalid='ignore')
+    return shapely.GeometryCollection(list(geometries[~shapely.is_missing(geometries)])).wkt
+
+
 async def get_crosswalk(db: AsyncSession, crosswalk_id: int):
     # Используем ST_AsText для конвертации геометрии в WKT
     from sqlalchemy import text
     result = await db.execute(
         text("""
             SELECT id, name, description, width, has_traffic_light,
-                   near_educational_institution, has_t7, created_at, updated_at,
+                   near_educational_institution, has_t7, road_id, created_at, updated_at,
                    ST_AsText(geom) as geom
             FROM crosswalks 
             WHERE id = :crosswalk_id
@@ -165,90 +691,440 @@ async def get_crosswalk(db: AsyncSession, crosswalk_id: int):
     )
     return result.mappings().first()
 
-async def get_crosswalks(db: AsyncSession, skip: int = 0, limit: int = 100):
-    # Используем ST_AsText для конвертации геометрии в WKT
+async def get_crosswalks(db: AsyncSession, skip: int = 0, limit: int = 100, after_id: int = None,
+                         geom_format: str = 'wkt', precision: int = None):
+    # Геометрия сериализуется в PostGIS (по умолчанию WKT через ST_AsText)
     from sqlalchemy import text
+    # С after_id страница выбирается по индексу id (keyset), без OFFSET
+    if after_id is not None:
+        page = "WHERE id > :after_id ORDER BY id LIMIT :limit"
+    else:
+        page = "ORDER BY id LIMIT :limit OFFSET :skip"
     result = await db.execute(
-        text("""
+        text(f"""
             SELECT id, name, description, width, has_traffic_light,
-                   near_educational_institution, has_t7, created_at, updated_at,
-                   ST_AsText(geom) as geom
+                   near_educational_institution, has_t7, road_id, created_at, updated_at,
+                   {geom_output_sql('geom', geom_format, precision)} as geom
             FROM crosswalks 
-            ORDER BY id 
-            LIMIT :limit OFFSET :skip
+            {page}
         """),
-        {"limit": limit, "skip": skip}
+        {"limit": limit, "skip": skip, "after_id": after_id}
     )
     return result.mappings().all()
 
 
-async def create_crosswalk(db: AsyncSession, crosswalk_in: CrosswalkCreate):
-    geom_wkt = crosswalk_in.geom
-    if geom_wkt.startswith('POINT'):
-        # Можно не проверять дальше, точка всегда валидна
-        pass
-    elif geom_wkt.startswith('LINESTRING'):
-        # Проверяем наличие минимум 2 точек
-        if 'EMPTY' in geom_wkt or geom_wkt.count(',') < 1:
-            raise ValueError("LINESTRING must have at least 2 points")
-    else:
-        raise ValueError("Geometry must be a POINT or LINESTRING")
+async def get_crosswalks_in_bbox(db: AsyncSession, bbox: tuple, limit: int = 1000,
+                                 geom_format: str = 'wkt', precision: int = None):
+    # Фильтр по bbox через && и ST_Intersects, чтобы использовался idx_crosswalks_geom
+    from sqlalchemy import text
+    minx, miny, maxx, maxy = bbox
+    result = await db.execute(
+        text(f"""
+            SELECT id, name, description, width, has_traffic_light,
+                   near_educational_institution, has_t7, road_id, created_at, updated_at,
+                   {geom_output_sql('geom', geom_format, precision)} as geom
+            FROM crosswalks
+            WHERE geom && ST_MakeEnvelope(:minx, :miny, :maxx, :maxy, 4326)
+              AND ST_Intersects(geom, ST_MakeEnvelope(:minx, :miny, :maxx, :maxy, 4326))
+            ORDER BY id
+            LIMIT :limit
+        """),
+        {"minx": minx, "miny": miny, "maxx": maxx, "maxy": maxy, "limit": limit}
+    )
+    return result.mappings().all()
 
-    # Используем только WKTElement
-    geom = WKTElement(geom_wkt, srid=4326)
 
-    db_crosswalk = Crosswalk(
-        name=crosswalk_in.name,
-        description=crosswalk_in.description,
-        width=crosswalk_in.width,
-        has_traffic_light=crosswalk_in.has_traffic_light,
-        near_educational_institution=crosswalk_in.near_educational_institution,
-        has_t7=crosswalk_in.has_t7,
-        geom=geom,
+async def get_crosswalks_near_road(db: AsyncSession, road_id: int, within_m: float = None, limit: int = 1000):
+    """Переходы дороги; None, если дороги нет.
+
+    Без within_m - привязанные к дороге (road_id, индекс ix_crosswalks_road_id),
+    с within_m - все переходы не дальше within_m метров от дороги.
+    """
+    if not await db.scalar(select(Road.id).where(Road.id == road_id)):
+        return None
+    if within_m is None:
+        result = await db.execute(
+            text("""
+                SELECT id, name, description, width, has_traffic_light,
+                       near_educational_institution, has_t7, road_id, created_at, updated_at,
+                       ST_AsText(geom) AS geom
+                FROM crosswalks
+                WHERE road_id = :road_id
+                ORDER BY id
+                LIMIT :limit
+            """),
+            {"road_id": road_id, "limit": limit}
+        )
+        return result.mappings().all()
+    # ST_DWithin на geography использует индекс idx_crosswalks_geog
+    result = await db.execute(
+        text("""
+            SELECT c.id, c.name, c.description, c.width, c.has_traffic_light,
+                   c.near_educational_institution, c.has_t7, c.road_id, c.created_at, c.updated_at,
+                   ST_AsText(c.geom) AS geom,
+                   ST_Distance(c.geom::geography, r.geom::geography) AS distance_m
+            FROM roads r
+            JOIN crosswalks c ON ST_DWithin(c.geom::geography, r.geom::geography, :within_m)
+            WHERE r.id = :road_id
+            ORDER BY distance_m, c.id
+            LIMIT :limit
+        """),
+        {"road_id": road_id, "within_m": within_m, "limit": limit}
     )
+    return result.mappings().all()
 
-    db.add(db_crosswalk)
-    await db.commit()
-    await db.refresh(db_crosswalk)
 
-    # Возвращаем полный объект Crosswalk (не словарь)
-    return db_crosswalk
+def cluster_cell_size(zoom: int) -> float:
+    """Размер ячейки сетки кластеров в градусах для зума (тайл 256 px = 360 / 2^zoom градусов)"""
+    return 360 / 2 ** zoom * settings.CROSSWALK_CLUSTER_CELL_PX / 256
+
+
+async def get_crosswalk_clusters(db: AsyncSession, bbox: tuple, zoom: int):
+    """Переходы в bbox, сгруппированные в ячейки сетки ST_SnapToGrid"""
+    minx, miny, maxx, maxy = bbox
+    result = await db.execute(
+        text("""
+            SELECT ST_X(ST_Centroid(ST_Collect(geom))) AS lon,
+                   ST_Y(ST_Centroid(ST_Collect(geom))) AS lat,
+                   count(*) AS count,
+                   count(*) FILTER (WHERE has_traffic_light) AS traffic_light_count,
+                   count(*) FILTER (WHERE has_t7) AS t7_count,
+                   CASE WHEN count(*) = 1 THEN min(id) END AS id
+            FROM crosswalks
+            WHERE geom && ST_MakeEnvelope(:minx, :miny, :maxx, :maxy, 4326)
+            GROUP BY ST_SnapToGrid(geom, :cell)
+        """),
+        {"minx": minx, "miny": miny, "maxx": maxx, "maxy": maxy, "cell": cluster_cell_size(zoom)}
+    )
+    return result.mappings().all()
+
+
+# Колонки перехода в ответах на запись и их типы для параметров запросов
+CROSSWALK_FIELDS = (
+    ('name', 'varchar'),
+    ('description', 'varchar'),
+    ('width', 'float8'),
+    ('has_traffic_light', 'boolean'),
+    ('near_educational_institution', 'boolean'),
+    ('has_t7', 'boolean'),
+    ('geom', 'text'),
+)
+CROSSWALK_RETURNING = """
+    c.id, c.name, c.description, c.width, c.has_traffic_light,
+    c.near_educational_institution, c.has_t7, c.road_id, c.created_at, c.updated_at,
+    ST_AsText(c.geom) AS geom
+"""
+
+
+async def create_crosswalk(db: AsyncSession, crosswalk_in: CrosswalkCreate):
+    """Создать переход одним INSERT ... RETURNING; дорога привязывается в том же запросе"""
+    validate_geometry(crosswalk_in.geom, CROSSWALK_GEOMETRY_TYPES)
+
+    columns = [name for name, _ in CROSSWALK_FIELDS if name != 'geom']
+    params = {name: getattr(crosswalk_in, name) for name, _ in CROSSWALK_FIELDS}
+    params['max_m'] = settings.CROSSWALK_SNAP_MAX_DISTANCE_M
+    # Порядок блокировок - см. lock_changes
+    await lock_changes(db)
+    result = await db.execute(
+        text(f"""
+            INSERT INTO crosswalks AS c ({", ".join(columns)}, geom, road_id)
+            SELECT {", ".join(f"CAST(:{name} AS {sql_type})" for name, sql_type in CROSSWALK_FIELDS if name != 'geom')},
+                   g.geom, {nearest_road_sql('g.geom')}
+            FROM (SELECT ST_GeomFromText(:geom, 4326) AS geom) g
+            RETURNING {CROSSWALK_RETURNING}
+        """),
+        params
+    )
+    crosswalk = dict(result.mappings().one())
+    change = await record_change(db, 'crosswalks', crosswalk['id'], crosswalk_in.geom)
+    await db.commit()
+    apply_change(change)
+    return crosswalk
 
 async def update_crosswalk(db: AsyncSession, crosswalk_id: int, crosswalk_in: CrosswalkUpdate):
-    result = await db.execute(select(Crosswalk).where(Crosswalk.id == crosswalk_id))
-    db_crosswalk = result.scalar_one_or_none()
-    if not db_crosswalk:
-        return None
+    """Частично обновить переход одним UPDATE ... RETURNING.
 
-    # Обновляем только те поля, что не равны None (partial update)
-    if crosswalk_in.name is not None:
-        db_crosswalk.name = crosswalk_in.name
-    if crosswalk_in.description is not None:
-        db_crosswalk.description = crosswalk_in.description
-    if crosswalk_in.width is not None:
-        db_crosswalk.width = crosswalk_in.width
-    if crosswalk_in.has_traffic_light is not None:
-        db_crosswalk.has_traffic_light = crosswalk_in.has_traffic_light
-    if crosswalk_in.near_educational_institution is not None:
-        db_crosswalk.near_educational_institution = crosswalk_in.near_educational_institution
-    if crosswalk_in.has_t7 is not None:
-        db_crosswalk.has_t7 = crosswalk_in.has_t7
+    Поля со значением None не меняются; при новой геометрии переход
+    перепривязывается к дороге в том же запросе.
+    """
     if crosswalk_in.geom is not None:
-        if not crosswalk_in.geom.startswith('LINESTRING'):
-            raise ValueError("Geometry must be a LINESTRING")
-        if 'EMPTY' in crosswalk_in.geom or crosswalk_in.geom.count(',') < 1:
-            raise ValueError("LINESTRING must have at least 2 points")
-        db_crosswalk.geom = WKTElement(crosswalk_in.geom, srid=4326)
+        validate_geometry(crosswalk_in.geom, CROSSWALK_GEOMETRY_TYPES)
 
+    params = {name: getattr(crosswalk_in, name) for name, _ in CROSSWALK_FIELDS}
+    params.update(crosswalk_id=crosswalk_id, max_m=settings.CROSSWALK_SNAP_MAX_DISTANCE_M)
+    assignments = ", ".join(
+        f"{name} = COALESCE(CAST(:{name} AS {sql_type}), c.{name})"
+        for name, sql_type in CROSSWALK_FIELDS if name != 'geom'
+    )
+    await lock_changes(db)
+    # Старая геометрия берется из снимка o, чтобы сбросить тайлы и на старом месте
+    result = await db.execute(
+        text(f"""
+            UPDATE crosswalks c
+            SET {assignments},
+                geom = COALESCE(g.geom, c.geom),
+                road_id = CASE WHEN g.geom IS NULL THEN c.road_id ELSE {nearest_road_sql('g.geom')} END,
+                updated_at = now()
+            FROM crosswalks o, (SELECT ST_GeomFromText(CAST(:geom AS text), 4326) AS geom) g
+            WHERE c.id = :crosswalk_id AND o.id = c.id
+            RETURNING {CROSSWALK_RETURNING}, ST_AsText(o.geom) AS old_geom
+        """),
+        params
+    )
+    crosswalk = result.mappings().first()
+    if crosswalk is None:
+        return None
+
+    crosswalk = dict(crosswalk)
+    old_wkt = crosswalk.pop('old_geom')
+    change = await record_change(db, 'crosswalks', crosswalk_id, old_wkt, crosswalk_in.geom)
     await db.commit()
-    await db.refresh(db_crosswalk)
-    return db_crosswalk
+    apply_change(change)
+    return crosswalk
 
 async def delete_crosswalk(db: AsyncSession, crosswalk_id: int):
-    result = await db.execute(select(Crosswalk).where(Crosswalk.id == crosswalk_id))
-    db_crosswalk = result.scalar_one_or_none()
-    if db_crosswalk:
-        await db.delete(db_crosswalk)
-        await db.commit()
-        return True
-    return False
\ No newline at end of file
+    await lock_changes(db)
+    result = await db.execute(
+        text("DELETE FROM crosswalks WHERE id = :crosswalk_id RETURNING ST_AsText(geom)"),
+        {"crosswalk_id": crosswalk_id}
+    )
+    old_wkt = result.scalar_one_or_none()
+    if old_wkt is None:
+        return False
+
+    change = await record_change(db, 'crosswalks', crosswalk_id, old_wkt, operation='delete')
+    await db.commit()
+    apply_change(change)
+    return True
+
+
+def _unnest(items: list, with_id: bool = False) -> tuple:
+    """Параметры и выражение unnest(...) для пачки переходов: по одному массиву на колонку"""
+    fields = ((('id', 'integer'),) if with_id else ()) + CROSSWALK_FIELDS
+    params = {f"v_{name}": [getattr(item, name) for item in items] for name, _ in fields}
+    arrays = ", ".join(f"CAST(:v_{name} AS {sql_type}[])" for name, sql_type in fields)
+    columns = ", ".join(name for name, _ in fields)
+    return f"unnest({arrays}) WITH ORDINALITY AS v({columns}, ord)", params
+
+
+async def batch_crosswalks(db: AsyncSession, create: list, update: list, delete: list) -> dict:
+    """Создать, изменить и удалить пачку переходов в одной транзакции.
+
+    Каждая операция - один запрос на всю пачку; журнал changes пишется
+    одним INSERT, NOTIFY отправляется один на всю пачку.
+    Ошибки геометрий поднимаются GeometryValidationError (index для create,
+    id для update). Если каких-то id для update/delete нет, транзакция
+    откатывается и поднимается LookupError со списком этих id.
+    """
+    # Все геометрии пачки проверяются одним векторным вызовом
+    updated_geoms = [item for item in update if item.geom is not None]
+    _, errors = validate_geometries(
+        [item.geom for item in create] + [item.geom for item in updated_geoms], CROSSWALK_GEOMETRY_TYPES
+    )
+    if errors:
+        for error in errors:
+            if error['index'] >= len(create):
+                error['id'] = updated_geoms[error.pop('index') - len(create)].id
+        raise GeometryValidationError(errors)
+
+    await lock_changes(db)
+    wkts = []
+    result = {'created': [], 'updated': [], 'deleted': []}
+
+    if delete:
+        rows = await db.execute(
+            text("DELETE FROM crosswalks WHERE id = ANY(:ids) RETURNING id, ST_AsText(geom) AS geom"),
+            {"ids": list(delete)}
+        )
+        for row in rows:
+            result['deleted'].append(row.id)
+            wkts.append(row.geom)
+
+    if update:
+        values, params = _unnest(update, with_id=True)
+        assignments = ", ".join(
+            f"{name} = COALESCE(v.{name}, c.{name})" for name, _ in CROSSWALK_FIELDS if name != 'geom'
+        )
+        # Старая геометрия берется из снимка o, чтобы сбросить тайлы и на старом месте
+        rows = await db.execute(
+            text(f"""
+                UPDATE crosswalks c
+                SET {assignments},
+                    geom = COALESCE(ST_GeomFromText(v.geom, 4326), c.geom),
+                    updated_at = now()
+                FROM {values}
+                JOIN crosswalks o ON o.id = v.id
+                WHERE c.id = v.id
+                RETURNING {CROSSWALK_RETURNING}, ST_AsText(o.geom) AS old_geom
+            """),
+            params
+        )
+        for row in rows.mappings():
+            row = dict(row)
+            wkts.extend((row.pop('old_geom'), row['geom']))
+            result['updated'].append(row)
+
+    missing = sorted(
+        (set(delete) - set(result['deleted'])) |
+        ({item.id for item in update} - {row['id'] for row in result['updated']})
+    )
+    if missing:
+        await db.rollback()
+        raise LookupError(missing)
+
+    if create:
+        values, params = _unnest(create)
+        columns = ", ".join(name for name, _ in CROSSWALK_FIELDS if name != 'geom')
+        rows = await db.execute(
+            text(f"""
+                INSERT INTO crosswalks AS c ({columns}, geom)
+                SELECT {columns}, ST_GeomFromText(geom, 4326)
+                FROM {values}
+                ORDER BY ord
+                RETURNING {CROSSWALK_RETURNING}
+            """),
+            params
+        )
+        result['created'] = [dict(row) for row in rows.mappings()]
+        wkts.extend(row['geom'] for row in result['created'])
+
+    # Перепривязываем новые и перемещенные переходы к дорогам
+    moved = [row['id'] for row in result['created']] + [item.id for item in updated_geoms]
+    if moved:
+        await snap_crosswalks(db, moved)
+        road_ids = dict((await db.execute(
+            text("SELECT id, road_id FROM crosswalks WHERE id = ANY(:ids)"), {"ids": moved}
+        )).all())
+        for row in result['created'] + result['updated']:
+            if row['id'] in road_ids:
+                row['road_id'] = road_ids[row['id']]
+
+    ids = [row['id'] for row in result['created'] + result['updated']] + result['deleted']
+    if not ids:
+        return result
+    operations = ['upsert'] * (len(ids) - len(result['deleted'])) + ['delete'] * len(result['deleted'])
+    await db.execute(
+        text("""
+            INSERT INTO changes (layer, item_id, operation)
+            SELECT 'crosswalks', item_id, operation
+            FROM unnest(CAST(:ids AS integer[]), CAST(:operations AS varchar[])) AS v(item_id, operation)
+        """),
+        {"ids": ids, "operations": operations}
+    )
+    change = await record_change(db, 'crosswalks', None, geometry_extent(*wkts))
+    await db.commit()
+    apply_change(change)
+    return result
+
+
+async def get_tile(db: AsyncSession, layer: str, z: int, x: int, y: int) -> bytes:
+    """Построить MVT тайл слоя средствами PostGIS"""
+    columns = TILE_LAYERS[layer]
+    result = await db.execute(
+        text(f"""
+            WITH bounds AS (
+                SELECT ST_TileEnvelope(:z, :x, :y) AS env,
+                       ST_Transform(ST_TileEnvelope(:z, :x, :y, margin => :margin), 4326) AS env_4326
+            ),
+            mvtgeom AS (
+                SELECT ST_AsMVTGeom(ST_Transform(t.geom, 3857), bounds.env, :extent, :buffer) AS geom,
+                       {columns}
+                FROM {layer} t, bounds
+                WHERE t.geom && bounds.env_4326
+            )
+            SELECT ST_AsMVT(mvtgeom.*, :layer, :extent, 'geom') FROM mvtgeom
+        """),
+        {
+            "z": z, "x": x, "y": y,
+            "margin": settings.TILE_BUFFER / settings.TILE_EXTENT,
+            "extent": settings.TILE_EXTENT,
+            "buffer": settings.TILE_BUFFER,
+            "layer": layer,
+        }
+    )
+    return result.scalar() or b""
+
+
+async def stream_roads(db: AsyncSession, geom_format: str = 'wkt', zoom: int = None, tolerance: float = None,
+                       precision: int = None):
+    """Выдавать дороги по одной через серверный курсор"""
+    stmt = (
+        select_roads(zoom, tolerance, geom_format, precision)
+        .order_by(Road.id)
+        .execution_options(yield_per=settings.STREAM_BATCH_SIZE)
+    )
+    result = await db.stream(stmt)
+    async for row in result.mappings():
+        yield row
+
+
+async def stream_crosswalks(db: AsyncSession, geom_format: str = 'wkt', precision: int = None):
+    """Выдавать пешеходные переходы по одному через серверный курсор"""
+    stmt = text(f"""
+        SELECT id, name, description, width, has_traffic_light,
+               near_educational_institution, has_t7, road_id, created_at, updated_at,
+               {geom_output_sql('geom', geom_format, precision)} as geom
+        FROM crosswalks
+        ORDER BY id
+    """).execution_options(yield_per=settings.STREAM_BATCH_SIZE)
+    result = await db.stream(stmt)
+    async for row in result.mappings():
+        yield row
+
+
+# Потоковое чтение слоев целиком (выгрузка, полные списки для карты)
+STREAM_LAYERS = {
+    'roads': stream_roads,
+    'crosswalks': stream_crosswalks,
+}
+
+
+async def get_changes_since(db: AsyncSession, since: int) -> dict:
+    """Изменения после версии since: текущие строки и id удаленных объектов"""
+    until = (await db.execute(text("SELECT coalesce(max(version), 0) FROM changes"))).scalar()
+    result = await db.execute(
+        text("""
+            SELECT layer, item_id, (array_agg(operation ORDER BY version DESC))[1] AS operation
+            FROM changes
+            WHERE version > :since AND version <= :until
+            GROUP BY layer, item_id
+        """),
+        {"since": since, "until": until}
+    )
+
+    upserted = {'roads': [], 'crosswalks': [], 'documents': []}
+    deleted = {'roads': [], 'crosswalks': [], 'documents': []}
+    for row in result:
+        target = deleted if row.operation == 'delete' else upserted
+        target.setdefault(row.layer, []).append(row.item_id)
+
+    roads = []
+    if upserted['roads']:
+        roads = (await db.execute(select_roads().where(Road.id.in_(upserted['roads'])))).mappings().all()
+
+    crosswalks = []
+    if upserted['crosswalks']:
+        crosswalks = (await db.execute(
+            text("""
+                SELECT id, name, description, width, has_traffic_light,
+                       near_educational_institution, has_t7, road_id, created_at, updated_at,
+                       ST_AsText(geom) as geom
+                FROM crosswalks
+                WHERE id = ANY(:ids)
+            """),
+            {"ids": upserted['crosswalks']}
+        )).mappings().all()
+
+    documents = []
+    if upserted['documents']:
+        documents = (await db.execute(
+            select(Document).where(Document.id.in_(upserted['documents']))
+        )).scalars().all()
+
+    return {
+        'version': until,
+        'roads': roads,
+        'crosswalks': crosswalks,
+        'documents': documents,
+        'deleted': deleted,
+    }
@@ -0,0 +1,72 @@
+from typing import Sequence
+
+import numpy as np
+import shapely
+from shapely import GeometryType
+
+# Допустимые типы геометрии по слоям (как у колонок geom в таблицах)
+ROAD_GEOMETRY_TYPES = (GeometryType.LINESTRING,)
+CROSSWALK_GEOMETRY_TYPES = (GeometryType.POINT,)
+
+# Форматы входной геометрии и их векторные парсеры
+PARSERS = {
+    'wkt': shapely.from_wkt,
+    'geojson': shapely.from_geojson,
+}
+
+
+class GeometryValidationError(ValueError):
+    """Ошибки проверки геометрий: список {'index', 'error'} по позициям в пачке"""
+
+    def __init__(self, errors: list):
+        self.errors = errors
+        super().__init__(errors[0]['error'] if len(errors) == 1 else
+                         f"{len(errors)} invalid geometries")
+
+
+def _type_names(allowed_types) -> str:
+    return " or ".join(geometry_type.name for geometry_type in allowed_types)
+
+
+def validate_geometries(texts: Sequence, allowed_types=ROAD_GEOMETRY_TYPES, fmt: str = 'wkt') -> tuple:
+    """Проверить пачку геометрий одним проходом векторных функций shapely.
+
+    Возвращает (geometries, errors): массив геометрий (None для невалидных)
+    и список ошибок {'index', 'error'} по позициям во входной пачке.
+    """
+    texts = np.array(texts, dtype=object)
+    if texts.ndim != 1:
+        texts = texts.reshape(-1)
+    geometries = PARSERS[fmt](texts, on_invalid='ignore')
+
+    type_ids = shapely.get_type_id(geometries)
+    num_points = shapely.get_num_points(geometries)
+    empty = shapely.is_empty(geometries)
+    valid = shapely.is_valid(geometries)
+    allowed = np.isin(type_ids, [int(geometry_type) for geometry_type in allowed_types])
+    is_line = type_ids == GeometryType.LINESTRING
+
+    errors = []
+    bad = shapely.is_missing(geometries) | ~allowed | empty | (is_line & (num_points < 2)) | ~valid
+    for index in np.flatnonzero(bad):
+        if shapely.is_missing(geometries[index]):
+            error = "Invalid geometry"
+        elif not allowed[index]:
+            error = f"Geometry must be a {_type_names(allowed_types)}"
+        elif empty[index] or (is_line[index] and num_points[index] < 2):
+            error = "LINESTRING must have at least 2 points" if is_line[index] else "Geometry is empty"
+        else:
+            error = shapely.is_valid_reason(geometries[index])
+        errors.append({'index': int(index), 'error': error})
+
+    geometries[bad] = None
+    return geometries, errors
+
+
+def validate_geometry(text: str, allowed_types=ROAD_GEOMETRY_TYPES, fmt: str = 'wkt'):
+    """Проверить одну геометрию; при ошибке поднимает GeometryValidationError"""
+    geometries, errors = validate_geometries([text], allowed_types, fmt)
+    if errors:
+        raise GeometryValidationError(errors)
+    return geometries[0]
+
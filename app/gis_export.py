@@ -0,0 +1,104 @@
+import os
+import shutil
+import tempfile
+from typing import AsyncIterator
+
+import pyarrow as pa
+import pyogrio
+from anyio import from_thread, to_thread
+
+from app.config import settings
+from app.crud import road_service
+from app.db.session import replica_read_session
+
+# Бинарные форматы выгрузки: (драйвер GDAL, MIME type, расширение файла)
+GIS_FORMATS = {
+    'flatgeobuf': ('FlatGeobuf', 'application/flatgeobuf', 'fgb'),
+    'gpkg': ('GPKG', 'application/geopackage+sqlite3', 'gpkg'),
+}
+
+# Тип геометрии и колонки слоя в порядке stream_roads / stream_crosswalks
+LAYER_SCHEMAS = {
+    'roads': ('LineString', pa.schema([
+        ('id', pa.int32()),
+        ('name', pa.string()),
+        ('geom', pa.binary()),
+    ])),
+    'crosswalks': ('Point', pa.schema([
+        ('id', pa.int32()),
+        ('name', pa.string()),
+        ('description', pa.string()),
+        ('width', pa.float64()),
+        ('has_traffic_light', pa.bool_()),
+        ('near_educational_institution', pa.bool_()),
+        ('has_t7', pa.bool_()),
+        ('road_id', pa.int32()),
+        ('created_at', pa.timestamp('us', tz='UTC')),
+        ('updated_at', pa.timestamp('us', tz='UTC')),
+        ('geom', pa.binary()),
+    ])),
+}
+
+# Размер блока при отдаче готового файла
+READ_CHUNK_SIZE = 1024 * 1024
+
+
+async def _record_batches(rows, schema: pa.Schema) -> AsyncIterator[pa.RecordBatch]:
+    """Собирает строки серверного курсора в Arrow-пачки по STREAM_BATCH_SIZE"""
+    batch = []
+    async for row in rows:
+        batch.append(row)
+        if len(batch) >= settings.STREAM_BATCH_SIZE:
+            yield pa.RecordBatch.from_pylist([dict(item) for item in batch], schema=schema)
+            batch = []
+    if batch:
+        yield pa.RecordBatch.from_pylist([dict(item) for item in batch], schema=schema)
+
+
+async def write_layer(layer: str, fmt: str, path: str, request):
+    """Записать слой в файл с пространственным индексом.
+
+    GDAL пишет в рабочем потоке и забирает Arrow-пачки из серверного
+    курсора по одной, так что в памяти держится не больше одной пачки.
+    Слой читается с реплики, см. replica_read_session.
+    """
+    driver = GIS_FORMATS[fmt][0]
+    geometry_type, schema = LAYER_SCHEMAS[layer]
+
+    async with replica_read_session(request) as db:
+        batches = _record_batches(road_service.STREAM_LAYERS[layer](db, geom_format='wkb'), schema)
+
+        async def next_batch():
+            return await anext(batches, None)
+
+        def pull():
+            while (batch := from_thread.run(next_batch)) is not None:
+                yield batch
+
+        def write():
+            pyogrio.write_arrow(
+                pa.RecordBatchReader.from_batches(schema, pull()), path,
+                layer=layer, driver=driver, geometry_name='geom',
+                geometry_type=geometry_type, crs='EPSG:4326',
+                layer_options={'SPATIAL_INDEX': 'YES'},
+            )
+
+        await to_thread.run_sync(write)
+
+
+async def stream_export(layer: str, fmt: str, request) -> AsyncIterator[bytes]:
+    """Выгрузка слоя файлом FlatGeobuf/GeoPackage.
+
+    Индекс пишется в начало (FlatGeobuf) или внутрь файла (GeoPackage),
+    поэтому файл сначала собирается во временном каталоге, затем отдается
+    блоками и удаляется.
+    """
+    directory = tempfile.mkdtemp(prefix='export-')
+    try:
+        path = os.path.join(directory, f"{layer}.{GIS_FORMATS[fmt][2]}")
+        await write_layer(layer, fmt, path, request)
+        with open(path, 'rb') as file:
+            while chunk := await to_thread.run_sync(file.read, READ_CHUNK_SIZE):
+                yield chunk
+    finally:
+        shutil.rmtree(directory, ignore_errors=True)
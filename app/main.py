@@ -1,8 +1,16 @@
-from fastapi import FastAPI
+from typing import List
 
-from app.db.session import engine
-from app.routers import routes  # импортируйте ваши роутеры
+from fastapi import FastAPI, Request
+
+from app.db.session import engine, replica_set, pool_statuses
+from app.schemas.schemas import PoolStatus
+from app.notifications import change_listener
+from app.road_index import road_index
+from app.tile_cache import tile_cache
+from app.config import settings
+from app.routers import routes, tiles, export, changes  # импортируйте ваши роутеры
 from fastapi.middleware.cors import CORSMiddleware
+from app.compression import CompressionMiddleware
 
 app = FastAPI(
     title="Интерактивная карта дорог",
@@ -24,22 +32,60 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["X-Next-Cursor", "ETag"],  # курсор пагинации и версия данных
 )
 
 
+# Сжатие ответов; сжатые варианты закэшированных ответов отдаются как есть
+app.add_middleware(CompressionMiddleware, minimum_size=settings.COMPRESSION_MIN_SIZE)
+
+
+# Изменивший данные клиент какое-то время читает с основной БД:
+# реплики могут еще не догнать его запись
+@app.middleware("http")
+async def read_your_writes(request: Request, call_next):
+    response = await call_next(request)
+    if (replica_set.replicas and request.method not in ("GET", "HEAD", "OPTIONS")
+            and response.status_code < 400):
+        response.set_cookie(
+            settings.READ_PRIMARY_COOKIE, "1",
+            max_age=settings.READ_PRIMARY_STICKY_SECONDS, httponly=True, samesite="lax",
+        )
+    return response
+
+
 # Включаем роутер дорог с префиксом /roads и тегом для документации
 app.include_router(routes.router, prefix="/roads", tags=["Roads"])
 app.include_router(routes.router, prefix="/api/v1", tags=["crosswalks"])
+app.include_router(tiles.router, prefix="/tiles", tags=["Tiles"])
+app.include_router(export.router, prefix="/export", tags=["Export"])
+app.include_router(changes.router, prefix="/changes", tags=["Sync"])
 
 @app.get("/")
 async def root():
     return {"message": "Добро пожаловать в API Интерактивной карты дорог"}
 
+@app.get("/health/db-pool", response_model=List[PoolStatus], tags=["Health"])
+async def db_pool_status():
+    """Занятые и свободные соединения пулов основной БД и реплик"""
+    return pool_statuses()
+
 @app.on_event("startup")
 async def startup_event():
-    # Можно инициализировать дополнительные объекты или подключения
-    pass
+    # Слушаем изменения от других процессов для сброса локальных кэшей
+    await change_listener.start()
+    # Удаление тайлов, на которые после инвалидаций не осталось ключей
+    await tile_cache.start()
+    # Реплики БД для чтения: первая проверка до приема запросов
+    await replica_set.start()
+    # Реплика дорог в памяти для bbox/nearest запросов без обращения к БД
+    if settings.ROAD_INDEX_ENABLED:
+        await road_index.start()
 
 @app.on_event("shutdown")
 async def shutdown():
+    await change_listener.stop()
+    await tile_cache.stop()
+    await road_index.stop()
+    await replica_set.stop()
     await engine.dispose()
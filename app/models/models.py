@@ -1,5 +1,5 @@
-from sqlalchemy import Integer, String, Column, ForeignKey, Date, DateTime, Float, Boolean, func
-from sqlalchemy.orm import relationship, DeclarativeBase
+from sqlalchemy import Integer, BigInteger, String, Column, ForeignKey, Date, DateTime, Float, Boolean, Index, func, text
+from sqlalchemy.orm import relationship, DeclarativeBase, deferred
 from geoalchemy2 import Geometry
 from datetime import datetime
 
@@ -11,7 +11,22 @@ class Road(Base):
     id = Column(Integer, primary_key=True, index=True)
     name = Column(String(255), nullable=False, index=True)
     geom = Column(Geometry(geometry_type='LINESTRING', srid=4326), nullable=False)
-    documents = relationship('Document', back_populates='road', cascade='all, delete-orphan', lazy="selectin")
+    # Упрощенные копии geom для мелких масштабов (см. road_service.ROAD_GEOM_LEVELS)
+    geom_z8 = deferred(Column(Geometry(geometry_type='LINESTRING', srid=4326, spatial_index=False)))
+    geom_z11 = deferred(Column(Geometry(geometry_type='LINESTRING', srid=4326, spatial_index=False)))
+    geom_z14 = deferred(Column(Geometry(geometry_type='LINESTRING', srid=4326, spatial_index=False)))
+    updated_at = Column(DateTime(timezone=True), server_default=func.now(), onupdate=func.now())
+    # Документы загружаются только явно (joinedload/selectinload в запросе),
+    # удаление дороги полагается на ON DELETE CASCADE в БД
+    documents = relationship('Document', back_populates='road', cascade='all, delete-orphan',
+                             lazy="raise", passive_deletes=True)
+
+    __table_args__ = (
+        # Триграммный индекс для поиска по подстроке (ILIKE '%q%') и similarity()
+        Index('ix_roads_name_trgm', 'name', postgresql_using='gin', postgresql_ops={'name': 'gin_trgm_ops'}),
+        # Индекс по geography для KNN в метрах (ближайшие дороги к точке)
+        Index('idx_roads_geog', text('(geom::geography)'), postgresql_using='gist'),
+    )
 
 class Document(Base):
     __tablename__ = 'documents'
@@ -22,6 +37,7 @@ class Document(Base):
     description = Column(String(500))               # Описание документа
     creation_date = Column(Date)                    # Дата создания документа
     upload_date = Column(DateTime, default=datetime.utcnow)  # Дата добавления в систему
+    updated_at = Column(DateTime(timezone=True), server_default=func.now(), onupdate=func.now())
     road = relationship('Road', back_populates='documents')
 
 
@@ -36,5 +52,32 @@ class Crosswalk(Base):
     near_educational_institution = Column(Boolean, default=False)
     has_t7 = Column(Boolean, default=False)
     geom = Column(Geometry('POINT', srid=4326), nullable=False)
+    # Ближайшая дорога, пересчитывается road_service.snap_crosswalks
+    road_id = Column(Integer, ForeignKey('roads.id', ondelete='SET NULL'), nullable=True, index=True)
     created_at = Column(DateTime(timezone=True), server_default=func.now())
-    updated_at = Column(DateTime(timezone=True), server_default=func.now(), onupdate=func.now())
\ No newline at end of file
+    updated_at = Column(DateTime(timezone=True), server_default=func.now(), onupdate=func.now())
+
+    __table_args__ = (
+        # Индекс по geography для ST_DWithin в метрах (переходы рядом с дорогой)
+        Index('idx_crosswalks_geog', text('(geom::geography)'), postgresql_using='gist'),
+    )
+
+
+class LayerVersion(Base):
+    """Версия слоя, увеличивается при каждой записи (для ETag и сброса кэшей)"""
+    __tablename__ = "layer_versions"
+
+    layer = Column(String(50), primary_key=True)
+    version = Column(BigInteger, nullable=False, default=0)
+    updated_at = Column(DateTime(timezone=True), server_default=func.now(), nullable=False)
+
+
+class Change(Base):
+    """Журнал изменений слоев для дельта-синхронизации (/changes?since=)"""
+    __tablename__ = "changes"
+
+    version = Column(BigInteger, primary_key=True, autoincrement=True)
+    layer = Column(String(50), nullable=False)
+    item_id = Column(Integer, nullable=False)
+    operation = Column(String(10), nullable=False)  # 'upsert' или 'delete'
+    changed_at = Column(DateTime(timezone=True), server_default=func.now(), nullable=False)
@@ -0,0 +1,95 @@
+import asyncio
+import json
+import logging
+from typing import Optional
+
+import asyncpg
+
+from app.crud import road_service
+from app.db.session import DATABASE_LISTEN_URL
+from app.response_cache import response_cache
+from app.tile_cache import tile_cache
+from app.road_index import road_index
+
+logger = logging.getLogger(__name__)
+
+
+class ChangeListener:
+    """Слушает NOTIFY об изменениях слоев на отдельном соединении asyncpg.
+
+    Каждый процесс API держит одно такое соединение и сбрасывает свои
+    локальные кэши, когда запись делает другой процесс.
+    """
+
+    def __init__(self, dsn: str, channel: str, reconnect_delay: float = 5.0):
+        self.dsn = dsn
+        self.channel = channel
+        self.reconnect_delay = reconnect_delay
+        self._connection: Optional[asyncpg.Connection] = None
+        self._reconnect_task: Optional[asyncio.Task] = None
+        self._stopped = False
+
+    async def start(self):
+        """Подключиться и начать слушать канал; при ошибке переподключаемся в фоне"""
+        if self.dsn is None:
+            # Без LISTEN кэши процесса не узнают о чужих записях и молча устаревают
+            raise RuntimeError("DB_PGBOUNCER requires DATABASE_LISTEN_URL: a direct Postgres DSN for LISTEN")
+        self._stopped = False
+        try:
+            await self._connect()
+        except (OSError, asyncpg.PostgresError) as e:
+            logger.warning("Change listener is not connected: %s", e)
+            self._schedule_reconnect()
+
+    async def stop(self):
+        self._stopped = True
+        if self._reconnect_task:
+            self._reconnect_task.cancel()
+            self._reconnect_task = None
+        if self._connection and not self._connection.is_closed():
+            await self._connection.close()
+        self._connection = None
+
+    async def _connect(self):
+        connection = await asyncpg.connect(self.dsn)
+        await connection.add_listener(self.channel, self._on_notification)
+        connection.add_termination_listener(self._on_termination)
+        self._connection = connection
+
+    def _on_notification(self, connection, pid, channel, payload):
+        try:
+            change = json.loads(payload)
+        except ValueError:
+            logger.warning("Malformed change notification: %r", payload)
+            return
+        road_service.apply_change(change)
+
+    def _on_termination(self, connection):
+        if not self._stopped:
+            logger.warning("Change listener connection lost, reconnecting")
+            self._schedule_reconnect()
+
+    def _schedule_reconnect(self):
+        if self._reconnect_task is None or self._reconnect_task.done():
+            self._reconnect_task = asyncio.get_running_loop().create_task(self._reconnect())
+
+    async def _reconnect(self):
+        while not self._stopped:
+            await asyncio.sleep(self.reconnect_delay)
+            try:
+                await self._connect()
+            except (OSError, asyncpg.PostgresError) as e:
+                logger.warning("Change listener reconnect failed: %s", e)
+                continue
+            # Пока соединения не было, уведомления могли потеряться
+            response_cache.clear()
+            for layer in road_service.TILE_LAYERS:
+                tile_cache.clear_layer(layer)
+            road_index.reload()
+            return
+
+
+change_listener = ChangeListener(
+    DATABASE_LISTEN_URL and DATABASE_LISTEN_URL.replace("postgresql+asyncpg://", "postgresql://"),
+    road_service.CHANGES_CHANNEL,
+)
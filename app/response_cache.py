@@ -0,0 +1,96 @@
+import time
+from collections import OrderedDict
+from typing import Optional
+
+from app.config import settings
+
+
+class ResponseCache:
+    """LRU кэш готовых тел ответов с TTL и инвалидацией по тегам.
+
+    Каждая запись помечена тегами (например 'roads:list', 'roads:5').
+    Запись в road_service сбрасывает только записи со своими тегами.
+    """
+
+    def __init__(self, max_entries: int, max_bytes: int, ttl: float):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self._entries = OrderedDict()  # key -> (expires_at, tags, body, headers)
+        self._tag_keys = {}            # tag -> set(keys)
+        self._generations = {}         # tag -> счетчик инвалидаций
+        self._size = 0
+
+    def generation(self, tags) -> tuple:
+        """Снимок поколений тегов; берется до чтения данных из БД"""
+        return tuple(self._generations.get(tag, 0) for tag in tags)
+
+    def get(self, key) -> Optional[tuple]:
+        """Получить (body, headers) или None"""
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        expires_at, _, body, headers = entry
+        if expires_at < time.monotonic():
+            self._remove(key)
+            return None
+        self._entries.move_to_end(key)
+        return body, headers
+
+    def put(self, key, body: bytes, headers: dict, tags, generation: tuple) -> None:
+        """Сохранить ответ, если с момента чтения теги не сбрасывались"""
+        if generation != self.generation(tags) or len(body) > settings.RESPONSE_CACHE_MAX_ENTRY_BYTES:
+            return
+
+        self._remove(key)
+        self._entries[key] = (time.monotonic() + self.ttl, tuple(tags), body, headers)
+        self._size += len(body)
+        for tag in tags:
+            self._tag_keys.setdefault(tag, set()).add(key)
+
+        while self._entries and (len(self._entries) > self.max_entries or self._size > self.max_bytes):
+            self._remove(next(iter(self._entries)))
+
+    def invalidate(self, *tags) -> None:
+        """Сбросить все записи с любым из тегов"""
+        for tag in tags:
+            self._generations[tag] = self._generations.get(tag, 0) + 1
+            for key in self._tag_keys.pop(tag, set()):
+                self._remove(key)
+
+    def clear(self) -> None:
+        for tag in list(self._generations):
+            self._generations[tag] += 1
+        self._entries.clear()
+        self._tag_keys.clear()
+        self._size = 0
+
+    def _remove(self, key) -> None:
+        entry = self._entries.pop(key, None)
+        if entry is None:
+            return
+        _, tags, body, _ = entry
+        self._size -= len(body)
+        for tag in tags:
+            keys = self._tag_keys.get(tag)
+            if keys is not None:
+                keys.discard(key)
+                if not keys:
+                    del self._tag_keys[tag]
+
+
+def list_tag(layer: str) -> str:
+    """Тег списочных ответов слоя"""
+    return f"{layer}:list"
+
+
+def item_tag(layer: str, item_id: int) -> str:
+    """Тег ответа по одному объекту слоя"""
+    return f"{layer}:{item_id}"
+
+
+response_cache = ResponseCache(
+    max_entries=settings.RESPONSE_CACHE_MAX_ENTRIES,
+    max_bytes=settings.RESPONSE_CACHE_MAX_BYTES,
+    ttl=settings.RESPONSE_CACHE_TTL,
+)
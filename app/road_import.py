@@ -0,0 +1,237 @@
+import csv
+import io
+import json
+from typing import BinaryIO, Iterator
+
+import anyio
+import numpy as np
+import shapely
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.config import settings
+from app.crud import road_service
+from app.geometry_validation import ROAD_GEOMETRY_TYPES, validate_geometries
+
+# Формат по расширению файла
+IMPORT_FORMATS = {
+    'csv': 'csv',
+    'geojson': 'geojson',
+    'json': 'geojson',
+    'geojsonl': 'geojsonseq',
+    'geojsons': 'geojsonseq',
+    'ndjson': 'geojsonseq',
+}
+
+MAX_NAME_LENGTH = 255
+
+# Символов на одно чтение при потоковом разборе FeatureCollection
+READ_CHUNK_SIZE = 64 * 1024
+
+
+def detect_format(filename: str) -> str:
+    """Определить формат импорта по расширению файла"""
+    extension = filename.rsplit('.', 1)[-1].lower() if filename and '.' in filename else ''
+    if extension not in IMPORT_FORMATS:
+        raise ValueError(f"Unsupported import file type: {filename}")
+    return IMPORT_FORMATS[extension]
+
+
+def read_records(file: BinaryIO, fmt: str) -> Iterator[tuple]:
+    """Читает записи (line, name, geometry) из файла.
+
+    geometry - WKT для CSV и строка GeoJSON геометрии для GeoJSON.
+    CSV и GeoJSONSeq читаются построчно, FeatureCollection - по одному объекту
+    из массива features, без загрузки всего файла в память.
+    """
+    text_file = io.TextIOWrapper(file, encoding='utf-8-sig', newline='')
+
+    if fmt == 'csv':
+        reader = csv.DictReader(text_file)
+        for row in reader:
+            yield reader.line_num, row.get('name'), row.get('wkt') or row.get('geom')
+
+    elif fmt == 'geojsonseq':
+        for line_number, line in enumerate(text_file, start=1):
+            line = line.strip().lstrip('\x1e')  # RFC 8142 допускает разделитель RS
+            if line:
+                yield (line_number, *_feature_record(line))
+
+    elif fmt == 'geojson':
+        for number, feature in enumerate(_collection_features(text_file), start=1):
+            yield (number, *_feature_record(feature))
+
+    else:
+        raise ValueError(f"Unsupported import format: {fmt}")
+
+
+class _JsonStream:
+    """Потоковый разбор JSON: значения читаются по одному через raw_decode"""
+
+    decoder = json.JSONDecoder()
+
+    def __init__(self, text_file):
+        self.file = text_file
+        self.buffer = ''
+        self.pos = 0
+        self.eof = False
+
+    def _fill(self):
+        chunk = self.file.read(READ_CHUNK_SIZE)
+        if not chunk:
+            self.eof = True
+        self.buffer = self.buffer[self.pos:] + chunk
+        self.pos = 0
+
+    def peek(self) -> str:
+        """Следующий символ после пробелов ('' в конце файла)"""
+        while True:
+            while self.pos < len(self.buffer) and self.buffer[self.pos].isspace():
+                self.pos += 1
+            if self.pos < len(self.buffer) or self.eof:
+                return self.buffer[self.pos:self.pos + 1]
+            self._fill()
+
+    def expect(self, char: str):
+        if self.peek() != char:
+            raise ValueError(f"Invalid GeoJSON: expected '{char}'")
+        self.pos += 1
+
+    def value(self):
+        self.peek()
+        while True:
+            try:
+                value, end = self.decoder.raw_decode(self.buffer, self.pos)
+            except json.JSONDecodeError:
+                if self.eof:
+                    raise
+                self._fill()
+                continue
+            # Число у конца буфера могло быть прочитано не полностью
+            if end == len(self.buffer) and not self.eof:
+                self._fill()
+                continue
+            self.pos = end
+            return value
+
+
+def _collection_features(text_file) -> Iterator:
+    """Объекты массива features из FeatureCollection по одному"""
+    stream = _JsonStream(text_file)
+    if stream.peek() != '{':
+        raise ValueError("GeoJSON must be a FeatureCollection")
+    stream.expect('{')
+    if stream.peek() == '}':
+        return
+    while True:
+        key = stream.value()
+        stream.expect(':')
+        if key == 'features' and stream.peek() == '[':
+            stream.expect('[')
+            if stream.peek() == ']':
+                stream.expect(']')
+            else:
+                while True:
+                    yield stream.value()
+                    if stream.peek() == ']':
+                        stream.expect(']')
+                        break
+                    stream.expect(',')
+        else:
+            stream.value()
+        if stream.peek() == '}':
+            return
+        stream.expect(',')
+
+
+def _feature_record(feature) -> tuple:
+    if isinstance(feature, str):
+        try:
+            feature = json.loads(feature)
+        except ValueError:
+            return None, None
+    if not isinstance(feature, dict):
+        return None, None
+    properties = feature.get('properties') or {}
+    geometry = feature.get('geometry')
+    return properties.get('name'), json.dumps(geometry) if geometry else None
+
+
+def validate_batch(records: list, fmt: str) -> tuple:
+    """Проверить пачку записей: геометрии одним вызовом validate_geometries.
+
+    Возвращает (rows, errors, bounds): строки для COPY (line, name, wkb),
+    ошибки по строкам файла и охват валидных геометрий.
+    """
+    lines = [record[0] for record in records]
+    names = [record[1] for record in records]
+    geoms, geometry_errors = validate_geometries(
+        [record[2] for record in records], ROAD_GEOMETRY_TYPES, 'wkt' if fmt == 'csv' else 'geojson'
+    )
+    geometry_errors = {error['index']: error['error'] for error in geometry_errors}
+
+    rows = []
+    errors = []
+    ok = np.zeros(len(records), dtype=bool)
+    for i, line in enumerate(lines):
+        name = names[i]
+        if i in geometry_errors:
+            errors.append({'line': line, 'error': geometry_errors[i]})
+        elif not name or not str(name).strip():
+            errors.append({'line': line, 'error': "Name is required"})
+        elif len(str(name)) > MAX_NAME_LENGTH:
+            errors.append({'line': line, 'error': f"Name is longer than {MAX_NAME_LENGTH} characters"})
+        else:
+            ok[i] = True
+
+    if ok.any():
+        wkbs = shapely.to_wkb(geoms[ok])
+        ok_lines = [line for line, flag in zip(lines, ok) if flag]
+        ok_names = [str(name) for name, flag in zip(names, ok) if flag]
+        rows = list(zip(ok_lines, ok_names, wkbs))
+        bounds = shapely.total_bounds(geoms[ok]).tolist()
+    else:
+        bounds = None
+
+    return rows, errors, bounds
+
+
+def _merge_bounds(a, b):
+    if a is None:
+        return b
+    if b is None:
+        return a
+    return [min(a[0], b[0]), min(a[1], b[1]), max(a[2], b[2]), max(a[3], b[3])]
+
+
+def _read_batch(records: Iterator, fmt: str) -> tuple:
+    """Прочитать и проверить следующую пачку записей; (rows, errors, bounds, done)"""
+    batch = []
+    for record in records:
+        batch.append(record)
+        if len(batch) >= settings.IMPORT_BATCH_SIZE:
+            return (*validate_batch(batch, fmt), False)
+    if not batch:
+        return [], [], None, True
+    return (*validate_batch(batch, fmt), True)
+
+
+async def import_roads_file(db: AsyncSession, file: BinaryIO, fmt: str) -> dict:
+    """Импорт дорог из файла: проверка пачками, COPY в staging, одно слияние в roads.
+
+    Разбор файла и проверка пачек идут в рабочем потоке, не блокируя цикл событий.
+    """
+    await road_service.create_roads_staging(db)
+
+    errors = []
+    bounds = None
+    records = read_records(file, fmt)
+    done = False
+    while not done:
+        rows, batch_errors, batch_bounds, done = await anyio.to_thread.run_sync(_read_batch, records, fmt)
+        errors.extend(batch_errors)
+        bounds = _merge_bounds(bounds, batch_bounds)
+        if rows:
+            await road_service.copy_roads_to_staging(db, rows)
+
+    imported = await road_service.merge_staged_roads(db, bounds) if bounds else 0
+    return {'imported': imported, 'errors': errors}
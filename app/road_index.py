@@ -0,0 +1,269 @@
+import asyncio
+import logging
+import math
+from datetime import datetime
+from typing import Optional
+
+import numpy as np
+import shapely
+from anyio import to_thread
+from sqlalchemy import select, func, text
+
+from app.config import settings
+from app.db.session import AsyncSessionLocal, read_session
+from app.models.models import Road
+
+logger = logging.getLogger(__name__)
+
+EARTH_RADIUS_M = 6371008.8
+METERS_PER_DEGREE = math.pi * EARTH_RADIUS_M / 180
+
+# Начальный радиус поиска ближайших дорог; увеличивается, пока не найдется k
+NEAREST_START_RADIUS_M = 200
+NEAREST_MAX_RADIUS_M = math.pi * EARTH_RADIUS_M
+
+# Упрощенные геометрии (уровни road_service.ROAD_GEOM_LEVELS) хранятся рядом
+# с исходной в WKT из PostGIS, как их отдает БД; без уровня - исходная геометрия
+LEVEL_COLUMNS = (Road.geom_z8, Road.geom_z11, Road.geom_z14)
+WKT_COLUMNS = (
+    func.ST_AsText(Road.geom),
+    *(func.ST_AsText(func.coalesce(column, Road.geom)) for column in LEVEL_COLUMNS),
+)
+# Колонка уровня -> позиция в кортеже WKT дороги
+LEVEL_POSITIONS = {column.key: position for position, column in enumerate(LEVEL_COLUMNS, 1)}
+
+
+def _degrees_box(lon: float, lat: float, radius_m: float):
+    """Прямоугольник в градусах, гарантированно накрывающий круг radius_m вокруг точки"""
+    dlat = radius_m / METERS_PER_DEGREE
+    dlon = radius_m / (METERS_PER_DEGREE * max(math.cos(math.radians(lat)), 0.01))
+    return shapely.box(lon - dlon, lat - dlat, lon + dlon, lat + dlat)
+
+
+def _distances_m(geoms, lon: float, lat: float) -> np.ndarray:
+    """Расстояния от точки до геометрий в метрах.
+
+    Считаются в равнопромежуточной проекции с центром в точке:
+    на расстояниях до десятков километров погрешность меньше процента.
+    """
+    scale = np.array([METERS_PER_DEGREE * math.cos(math.radians(lat)), METERS_PER_DEGREE])
+    local = shapely.transform(np.asarray(geoms, dtype=object), lambda coords: (coords - (lon, lat)) * scale)
+    return shapely.distance(local, shapely.Point(0, 0))
+
+
+class RoadIndex:
+    """Реплика геометрий дорог в памяти процесса на STRtree.
+
+    Дерево строится пачкой при старте. Изменения после сборки попадают
+    в overlay и перекрывают записи дерева; когда их больше
+    rebuild_threshold, дерево пересобирается в рабочем потоке.
+    Реплика помнит последнюю учтенную версию слоя roads и отвечает
+    под ней без обращения к БД (versions).
+    """
+
+    def __init__(self, rebuild_threshold: int, retry_delay: float = 5.0):
+        self.rebuild_threshold = rebuild_threshold
+        self.retry_delay = retry_delay
+        self.ready = False
+        self._started = False
+        self._ids = np.empty(0, dtype=np.int64)
+        self._names = []
+        # Кортежи WKT: исходная геометрия и уровни упрощения (LEVEL_POSITIONS)
+        self._wkts = []
+        self._geoms = np.empty(0, dtype=object)
+        self._tree = shapely.STRtree(self._geoms)
+        self._generation = 0  # растет при каждой подмене дерева
+        # id -> (name, wkts, geom) измененной дороги или None для удаленной
+        self._overlay = {}
+        # id -> номер последнего запроса на перечитывание дороги
+        self._pending = {}
+        self._sequence = 0
+        # Последняя версия слоя roads, изменения до которой получены, и ее время
+        self._version = 0
+        self._updated_at: Optional[datetime] = None
+        self._load_task: Optional[asyncio.Task] = None
+        self._rebuild_task: Optional[asyncio.Task] = None
+        self._tasks = set()
+
+    async def start(self):
+        """Начать сборку индекса в фоне; до ее окончания запросы идут в БД"""
+        self._started = True
+        self.reload()
+
+    async def stop(self):
+        self._started = False
+        self.ready = False
+        for task in [self._load_task, self._rebuild_task, *self._tasks]:
+            if task:
+                task.cancel()
+        self._tasks.clear()
+
+    def versions(self) -> Optional[dict]:
+        """Версия слоя roads для ETag ответа из реплики: {'roads': (version, updated_at)}.
+
+        None, пока реплика собирается или перечитывает изменения: тогда
+        запрос идет в БД, иначе старая геометрия ушла бы под новой версией.
+        """
+        if not self.ready or self._pending or (self._load_task is not None and not self._load_task.done()):
+            return None
+        return {'roads': (self._version, self._updated_at)}
+
+    def _set_version(self, version: int, updated_at: Optional[datetime]):
+        if version > self._version:
+            self._version, self._updated_at = version, updated_at
+
+    def reload(self):
+        """Перечитать все дороги (после массовых изменений или потери NOTIFY)"""
+        if not self._started:
+            return
+        if self._load_task and not self._load_task.done():
+            self._load_task.cancel()
+        self._load_task = asyncio.get_running_loop().create_task(self._load())
+
+    def apply_change(self, change: dict):
+        """Учесть изменение дорог: своей записи или пришедшее по NOTIFY"""
+        if not self._started or change.get('table') != 'roads':
+            return
+        if change.get('version'):
+            updated_at = change.get('updated_at')
+            self._set_version(change['version'], updated_at and datetime.fromisoformat(updated_at))
+        if change.get('id') is None:
+            self.reload()
+            return
+        road_id = change['id']
+        self._sequence += 1
+        self._pending[road_id] = self._sequence
+        task = asyncio.get_running_loop().create_task(self._refresh(road_id, self._sequence))
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+
+    async def _load(self):
+        while self._started:
+            superseded = dict(self._overlay)
+            try:
+                # Дороги и версия слоя из одного снимка (REPEATABLE READ)
+                async with read_session() as db:
+                    version = (await db.execute(
+                        text("SELECT version, updated_at FROM layer_versions WHERE layer = 'roads'")
+                    )).first()
+                    result = await db.stream(
+                        select(Road.id, Road.name, *WKT_COLUMNS)
+                        .execution_options(yield_per=settings.STREAM_BATCH_SIZE)
+                    )
+                    rows = [tuple(row) async for row in result]
+            except Exception as e:
+                logger.warning("Road index load failed: %s", e)
+                await asyncio.sleep(self.retry_delay)
+                continue
+
+            ids = np.array([row[0] for row in rows], dtype=np.int64)
+            wkts = [row[2:] for row in rows]
+            geoms, tree = await to_thread.run_sync(self._build, [row[2] for row in rows])
+            self._install(ids, [row[1] for row in rows], wkts, geoms, tree, superseded)
+            if version:
+                self._set_version(*version)
+            self.ready = True
+            logger.info("Road index loaded: %d roads", len(ids))
+            return
+
+    async def _refresh(self, road_id: int, sequence: int):
+        try:
+            async with AsyncSessionLocal() as db:
+                row = (await db.execute(
+                    select(Road.name, *WKT_COLUMNS).where(Road.id == road_id)
+                )).first()
+        except Exception as e:
+            logger.warning("Road index refresh of road %s failed: %s", road_id, e)
+            self.ready = False
+            self.reload()
+            return
+
+        # Более поздний запрос по той же дороге уже в пути
+        if self._pending.get(road_id) != sequence:
+            return
+        del self._pending[road_id]
+        self._overlay[road_id] = (row[0], tuple(row[1:]), shapely.from_wkt(row[1])) if row else None
+
+        if len(self._overlay) > self.rebuild_threshold and (self._rebuild_task is None or self._rebuild_task.done()):
+            self._rebuild_task = asyncio.get_running_loop().create_task(self._rebuild())
+
+    async def _rebuild(self):
+        """Перенести overlay в дерево"""
+        generation = self._generation
+        snapshot = dict(self._overlay)
+        keep = ~np.isin(self._ids, np.fromiter(snapshot, dtype=np.int64, count=len(snapshot)))
+        upserts = [(road_id, entry) for road_id, entry in snapshot.items() if entry is not None]
+
+        ids = np.concatenate([self._ids[keep], np.array([road_id for road_id, _ in upserts], dtype=np.int64)])
+        names = [name for name, flag in zip(self._names, keep) if flag] + [entry[0] for _, entry in upserts]
+        wkts = [wkt for wkt, flag in zip(self._wkts, keep) if flag] + [entry[1] for _, entry in upserts]
+        geoms = np.concatenate([self._geoms[keep], np.array([entry[2] for _, entry in upserts], dtype=object)])
+
+        tree = await to_thread.run_sync(shapely.STRtree, geoms)
+        # Пока дерево строилось, индекс мог быть перечитан из БД целиком
+        if generation == self._generation:
+            self._install(ids, names, wkts, geoms, tree, snapshot)
+
+    @staticmethod
+    def _build(wkts: list) -> tuple:
+        geoms = shapely.from_wkt(np.array(wkts, dtype=object))
+        return geoms, shapely.STRtree(geoms)
+
+    def _install(self, ids, names, wkts, geoms, tree, superseded: dict):
+        """Подменить дерево и убрать из overlay записи, которые в него вошли"""
+        self._ids, self._names, self._wkts, self._geoms, self._tree = ids, names, wkts, geoms, tree
+        self._generation += 1
+        for road_id, entry in superseded.items():
+            if self._overlay.get(road_id, entry) is entry:
+                self._overlay.pop(road_id, None)
+
+    def _candidates(self, window, predicate: str = None) -> list:
+        """Дороги (id, name, wkts, geom), чей охват пересекает window (или predicate)"""
+        candidates = [
+            (int(self._ids[i]), self._names[i], self._wkts[i], self._geoms[i])
+            for i in self._tree.query(window, predicate=predicate)
+            if int(self._ids[i]) not in self._overlay
+        ]
+        for road_id, entry in self._overlay.items():
+            if entry is None:
+                continue
+            hit = shapely.intersects(entry[2], window) if predicate else shapely.intersects(shapely.envelope(entry[2]), window)
+            if hit:
+                candidates.append((road_id, *entry))
+        return candidates
+
+    def in_bbox(self, bbox: tuple, limit: int, level: str = None) -> list:
+        """Дороги, пересекающие bbox, по возрастанию id (как get_roads_in_bbox).
+
+        level - колонка уровня упрощения (geom_z8, ...), None - исходная геометрия.
+        """
+        position = LEVEL_POSITIONS[level] if level else 0
+        candidates = sorted(self._candidates(shapely.box(*bbox), 'intersects'), key=lambda road: road[0])[:limit]
+        return [{'id': road_id, 'name': name, 'geom': wkts[position]} for road_id, name, wkts, _ in candidates]
+
+    def _with_distances(self, candidates: list, lon: float, lat: float) -> list:
+        distances = _distances_m([geom for *_, geom in candidates], lon, lat) if candidates else []
+        return sorted(
+            ({'id': road_id, 'name': name, 'geom': wkts[0], 'distance_m': float(distance)}
+             for (road_id, name, wkts, _), distance in zip(candidates, distances)),
+            key=lambda road: (road['distance_m'], road['id'])
+        )
+
+    def nearest(self, lon: float, lat: float, k: int) -> list:
+        """k ближайших к точке дорог с расстоянием в метрах"""
+        radius = NEAREST_START_RADIUS_M
+        while True:
+            roads = self._with_distances(self._candidates(_degrees_box(lon, lat, radius)), lon, lat)
+            within = [road for road in roads if road['distance_m'] <= radius]
+            # Дорога за пределами радиуса может оказаться ближе еще не найденных
+            if len(within) >= k or radius >= NEAREST_MAX_RADIUS_M:
+                return (within if len(within) >= k else roads)[:k]
+            radius *= 4
+
+    def at_point(self, lon: float, lat: float, radius_m: float, limit: int) -> list:
+        """Дороги не дальше radius_m метров от точки (попадание кликом по карте)"""
+        roads = self._with_distances(self._candidates(_degrees_box(lon, lat, radius_m)), lon, lat)
+        return [road for road in roads if road['distance_m'] <= radius_m][:limit]
+
+
+road_index = RoadIndex(settings.ROAD_INDEX_REBUILD_THRESHOLD)
@@ -0,0 +1,16 @@
+from fastapi import APIRouter, Depends, Query
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.schemas.schemas import ChangesResponse
+from app.db.session import get_read_db
+from app.crud import road_service
+
+router = APIRouter()
+
+
+@router.get("", response_model=ChangesResponse)
+async def read_changes(
+    since: int = Query(0, ge=0, description="Версия из предыдущего ответа; 0 - полная выгрузка изменений"),
+    db: AsyncSession = Depends(get_read_db)
+):
+    return await road_service.get_changes_since(db, since)
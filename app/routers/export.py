@@ -0,0 +1,40 @@
+from fastapi import APIRouter, HTTPException, Query, Request
+from fastapi.responses import StreamingResponse
+
+from app.crud import road_service
+from app import streaming
+from app import gis_export
+
+router = APIRouter()
+
+# Формат выгрузки: (кодировщик, MIME type, расширение файла)
+EXPORT_FORMATS = {
+    'geojson': (streaming.geojson_feature_collection, 'application/geo+json', 'geojson'),
+    'ndjson': (streaming.ndjson_features, 'application/x-ndjson', 'geojsonl'),
+}
+
+
+@router.get("/{layer}")
+async def export_layer(
+    layer: str,
+    request: Request,
+    format: str = Query('geojson', description="geojson, ndjson, flatgeobuf или gpkg")
+):
+    if layer not in road_service.STREAM_LAYERS:
+        raise HTTPException(status_code=404, detail="Layer not found")
+
+    if format in gis_export.GIS_FORMATS:
+        # Бинарные форматы с пространственным индексом
+        _, media_type, extension = gis_export.GIS_FORMATS[format]
+        body = gis_export.stream_export(layer, format, request)
+    elif format in EXPORT_FORMATS:
+        encoder, media_type, extension = EXPORT_FORMATS[format]
+        body = streaming.stream_layer(layer, encoder, geom_format='geojson', request=request)
+    else:
+        raise HTTPException(status_code=400, detail=f"Unsupported format {format}")
+
+    return StreamingResponse(
+        body,
+        media_type=media_type,
+        headers={"Content-Disposition": f'attachment; filename="{layer}.{extension}"'},
+    )
@@ -1,11 +1,23 @@
-from fastapi import APIRouter, Depends, HTTPException, UploadFile, File, Form, Query
+from fastapi import APIRouter, Depends, HTTPException, UploadFile, File, Form, Query, Request, Response
+from fastapi.responses import StreamingResponse
+from fastapi.concurrency import run_in_threadpool
 from typing import List, Optional
 from datetime import date
+from email.utils import format_datetime, parsedate_to_datetime
+import base64
+import binascii
+import json
+from functools import partial
 from sqlalchemy.ext.asyncio import AsyncSession
 
 from app.schemas.schemas import (
     Road,
     RoadCreate,
+    RoadName,
+    RoadSearchResult,
+    RoadImportReport,
+    NearestRoad,
+    NearbyCrosswalk,
     Document,
     RoadWithDocuments,
     RoadsListResponse,
@@ -13,52 +25,419 @@ from app.schemas.schemas import (
     Crosswalk,
     CrosswalkCreate,
     CrosswalkUpdate,
+    CrosswalkBatch,
+    CrosswalkClusters,
+    CrosswalkBatchResult,
 )
-from app.db.session import get_db
+from app.db.session import get_db, get_read_db, get_primary_read_db, replica_read_session
 from app.crud import road_service
+from app.config import settings
+from app import streaming
+from app import road_import
+from app import compression
+from app.geometry_validation import GeometryValidationError
+from app.road_index import road_index
+from app.response_cache import response_cache, list_tag, item_tag
 
 router = APIRouter()
 
+
+def parse_bbox(bbox: str) -> tuple:
+    """Разбирает строку bbox=minx,miny,maxx,maxy в кортеж чисел"""
+    try:
+        minx, miny, maxx, maxy = (float(v) for v in bbox.split(','))
+    except ValueError:
+        raise HTTPException(status_code=400, detail="bbox must be 'minx,miny,maxx,maxy'")
+    if minx >= maxx or miny >= maxy:
+        raise HTTPException(status_code=400, detail="bbox min values must be less than max values")
+    return minx, miny, maxx, maxy
+
+
+def encode_cursor(values: dict) -> str:
+    """Непрозрачный курсор keyset-пагинации"""
+    raw = json.dumps(values, separators=(',', ':')).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip('=')
+
+
+def decode_cursor(cursor: str) -> dict:
+    """Разбирает курсор, выданный encode_cursor"""
+    try:
+        raw = base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4))
+        values = json.loads(raw)
+    except (binascii.Error, ValueError):
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+    if not isinstance(values, dict) or not isinstance(values.get('id'), int):
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+    if not isinstance(values.get('rank', 0), (int, float)):
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+    return values
+
+
+def next_page_cursor(items, limit: int) -> Optional[str]:
+    """Курсор следующей страницы или None, если страница последняя"""
+    if len(items) < limit:
+        return None
+    last = items[-1]
+    values = {'id': last['id']}
+    # Для ранжированного поиска позиция определяется парой (rank, id)
+    if 'rank' in last:
+        values['rank'] = last['rank']
+    return encode_cursor(values)
+
+
+CursorQuery = Query(None, description="Курсор из next_cursor предыдущей страницы; skip при этом игнорируется")
+
+async def layer_headers(db: AsyncSession, layers) -> dict:
+    """Заголовки ETag/Last-Modified по текущим версиям слоев"""
+    return version_headers(await road_service.get_layer_versions(db, layers), layers)
+
+
+def version_headers(versions: dict, layers) -> dict:
+    etag = 'W/"' + '.'.join(f"{layer}-{versions[layer][0]}" for layer in layers) + '"'
+    headers = {"ETag": etag, "Cache-Control": "no-cache"}
+
+    modified = [updated_at for _, updated_at in versions.values() if updated_at]
+    if modified:
+        headers["Last-Modified"] = format_datetime(max(modified).replace(microsecond=0), usegmt=True)
+    return headers
+
+
+def is_fresh(request: Request, headers: dict) -> bool:
+    """Есть ли у клиента актуальная копия (If-None-Match / If-Modified-Since)"""
+    if_none_match = request.headers.get("if-none-match")
+    if if_none_match is not None:
+        tags = [tag.strip() for tag in if_none_match.split(',')]
+        return '*' in tags or headers["ETag"] in tags
+
+    if_modified_since = request.headers.get("if-modified-since")
+    if if_modified_since and "Last-Modified" in headers:
+        try:
+            return parsedate_to_datetime(headers["Last-Modified"]) <= parsedate_to_datetime(if_modified_since)
+        except (TypeError, ValueError):
+            return False
+    return False
+
+
+def validators_for(request: Request, versions: dict, layers) -> dict:
+    """Заголовки ETag/Last-Modified по версиям слоев; 304, если у клиента актуальная копия"""
+    headers = version_headers(versions, layers)
+    if is_fresh(request, headers):
+        raise HTTPException(status_code=304, headers=headers)
+    return headers
+
+
+def conditional_get(*layers: str):
+    """Зависимость для условных GET по версиям слоев.
+
+    Проставляет ETag/Last-Modified и отвечает 304, если у клиента
+    актуальная копия. Возвращает заголовки для эндпоинтов, которые
+    сами собирают Response.
+    """
+    async def dependency(request: Request, response: Response, db: AsyncSession = Depends(get_read_db)) -> dict:
+        headers = validators_for(request, await road_service.get_layer_versions(db, layers), layers)
+        response.headers.update(headers)
+        return headers
+
+    return Depends(dependency)
+
+
+def road_index_validators(request: Request) -> Optional[dict]:
+    """Заголовки по версии реплики дорог в памяти, без обращения к БД.
+
+    None, если реплика еще не готова: тогда отвечает БД (indexed_roads).
+    """
+    versions = road_index.versions()
+    if versions is None:
+        return None
+    return validators_for(request, versions, ('roads',))
+
+
+async def indexed_roads(request: Request, from_index, from_db, geom_format: str = 'wkt') -> Response:
+    """Ответ из реплики дорог в памяти или, если она не готова, из БД.
+
+    from_index() и from_db(db) возвращают строки ответа; from_index=None -
+    запрос реплика не обслуживает. Соединение с БД берется только во втором случае.
+    """
+    validators = road_index_validators(request) if from_index else None
+    if validators is not None:
+        return json_response(from_index(), validators)
+    async with replica_read_session(request) as db:
+        validators = validators_for(request, await road_service.get_layer_versions(db, ('roads',)), ('roads',))
+        return json_response(await from_db(db), validators, geom_format)
+
+
+async def encoded_response(request: Request, key, body: bytes, headers: dict, tags, generation: tuple) -> Response:
+    """JSON ответ из готового тела.
+
+    Сжатый вариант (gzip/br) хранится в кэше рядом с исходным телом под
+    ключом (key, encoding) и сбрасывается по тем же тегам.
+    """
+    encoding = compression.negotiate(request.headers.get("accept-encoding", ""))
+    if encoding is None or len(body) < settings.COMPRESSION_MIN_SIZE:
+        return Response(content=body, media_type="application/json", headers=headers)
+
+    cached = response_cache.get((key, encoding))
+    if cached is None:
+        compressed = await run_in_threadpool(compression.compress, body, encoding)
+        response_cache.put((key, encoding), compressed, headers, tags, generation)
+    else:
+        compressed = cached[0]
+    return Response(
+        content=compressed,
+        media_type="application/json",
+        headers={**headers, "Content-Encoding": encoding, "Vary": "Accept-Encoding"},
+    )
+
+
+async def cached_json(request: Request, db: AsyncSession, key, tags, layers, load) -> Response:
+    """Ответ из кэша готовых байтов.
+
+    При промахе load(headers) читает данные и возвращает тело ответа;
+    дополнительные заголовки он может добавить в headers. Промахи читаются
+    с основной БД: ответ отстающей реплики остался бы в кэше до следующего изменения.
+    """
+    generation = response_cache.generation(tags)
+    cached = response_cache.get(key)
+    if cached is None:
+        headers = await layer_headers(db, layers)
+        if is_fresh(request, headers):
+            return Response(status_code=304, headers=headers)
+        body = await load(headers)
+        response_cache.put(key, body, headers, tags, generation)
+    else:
+        body, headers = cached
+        if is_fresh(request, headers):
+            return Response(status_code=304, headers=headers)
+    return await encoded_response(request, key, body, headers, tags, generation)
+
+
+async def cached_stream(request: Request, db: AsyncSession, key, tags, layers, chunks) -> Response:
+    """Потоковый ответ, тело которого сохраняется в кэш по завершении"""
+    generation = response_cache.generation(tags)
+    cached = response_cache.get(key)
+    if cached is not None:
+        body, headers = cached
+        if is_fresh(request, headers):
+            return Response(status_code=304, headers=headers)
+        return await encoded_response(request, key, body, headers, tags, generation)
+
+    headers = await layer_headers(db, layers)
+    if is_fresh(request, headers):
+        return Response(status_code=304, headers=headers)
+
+    async def tee():
+        parts = []
+        size = 0
+        async for chunk in chunks():
+            yield chunk
+            if parts is not None:
+                parts.append(chunk)
+                size += len(chunk)
+                if size > settings.RESPONSE_CACHE_MAX_ENTRY_BYTES:
+                    parts = None
+        if parts is not None:
+            response_cache.put(key, b''.join(parts), headers, tags, generation)
+
+    return StreamingResponse(tee(), media_type="application/json", headers=headers)
+
+
+def json_response(content, headers: dict = None, geom_format: str = 'wkt') -> Response:
+    """JSON ответ без повторной валидации: строки БД сразу кодируются orjson.
+
+    response_model эндпоинта при этом описывает ответ только в OpenAPI.
+    """
+    return Response(content=streaming.dumps(content, geom_format), media_type="application/json", headers=headers)
+
+
+# Параметры детализации геометрии дорог
+ZoomQuery = Query(None, ge=0, le=22, description="Зум карты, под который упрощается геометрия")
+ToleranceQuery = Query(None, gt=0, description="Допустимая погрешность упрощения в градусах")
+
+# Формат и точность геометрии в списках
+GeomFormatQuery = Query('wkt', pattern='^(wkt|geojson|polyline)$',
+                        description="wkt, geojson (geom - JSON объект геометрии) или polyline "
+                                    "(encoded polyline Google, порядок lat,lon)")
+PrecisionQuery = Query(None, ge=0, le=15, description="Знаков после запятой в координатах")
+
+
 # --- Roads ---
 
 @router.get("/", response_model=RoadsListResponse)
-async def read_roads(skip: int = 0, limit: int = 100, db: AsyncSession = Depends(get_db)):
-    roads = await road_service.get_roads(db, skip=skip, limit=limit)
-    total_count = await road_service.get_roads_count(db)
-    return RoadsListResponse(
-        roads=[Road.from_orm(r) for r in roads],
-        total_count=total_count,
-        skip=skip,
-        limit=limit
+async def read_roads(
+    skip: int = 0,
+    limit: int = 100,
+    cursor: Optional[str] = CursorQuery,
+    count: str = Query('exact', pattern='^(exact|estimate|none)$',
+                       description="exact - count(*), estimate - по статистике pg_class, none - без подсчета"),
+    zoom: Optional[int] = ZoomQuery,
+    tolerance: Optional[float] = ToleranceQuery,
+    format: str = GeomFormatQuery,
+    precision: Optional[int] = PrecisionQuery,
+    validators: dict = conditional_get('roads'),
+    db: AsyncSession = Depends(get_read_db)
+):
+    after_id = decode_cursor(cursor)['id'] if cursor else None
+    roads = await road_service.get_roads(
+        db, skip=skip, limit=limit, zoom=zoom, tolerance=tolerance, after_id=after_id,
+        geom_format=format, precision=precision
+    )
+
+    total_count = None
+    if count == 'exact':
+        total_count = await road_service.get_roads_count(db)
+    elif count == 'estimate':
+        total_count = await road_service.get_roads_count_estimate(db)
+
+    return json_response({
+        'roads': roads,
+        'total_count': total_count,
+        'skip': skip,
+        'limit': limit,
+        'next_cursor': next_page_cursor(roads, limit),
+    }, validators, format)
+
+@router.get("/bbox", response_model=List[Road])
+async def read_roads_in_bbox(
+    request: Request,
+    bbox: str = Query(..., description="minx,miny,maxx,maxy в EPSG:4326"),
+    limit: int = Query(settings.MAX_BBOX_FEATURES, ge=1, le=settings.MAX_BBOX_FEATURES),
+    zoom: Optional[int] = ZoomQuery,
+    tolerance: Optional[float] = ToleranceQuery,
+    format: str = GeomFormatQuery,
+    precision: Optional[int] = PrecisionQuery,
+):
+    bounds = parse_bbox(bbox)
+    level = road_service.road_geom_level(zoom, tolerance)
+
+    def from_index():
+        return road_index.in_bbox(bounds, limit, level=level[1].key if level else None)
+
+    async def from_db(db: AsyncSession):
+        return await road_service.get_roads_in_bbox(
+            db, bounds, limit=limit, zoom=zoom, tolerance=tolerance,
+            geom_format=format, precision=precision
+        )
+
+    # Реплика в памяти хранит WKT, другие форматы строит PostGIS
+    indexed = from_index if format == 'wkt' and precision is None else None
+    return await indexed_roads(request, indexed, from_db, format)
+
+@router.get("/search", response_model=List[RoadSearchResult])
+async def search_roads_endpoint(
+    query: Optional[str] = Query(None, title="Search query", description="Partial road name to search"),
+    skip: int = Query(0, ge=0),
+    limit: int = Query(100, ge=1, le=100),
+    cursor: Optional[str] = CursorQuery,
+    zoom: Optional[int] = ZoomQuery,
+    tolerance: Optional[float] = ToleranceQuery,
+    format: str = GeomFormatQuery,
+    precision: Optional[int] = PrecisionQuery,
+    validators: dict = conditional_get('roads'),
+    db: AsyncSession = Depends(get_read_db)
+):
+    after = decode_cursor(cursor) if cursor else {}
+    roads = await road_service.search_roads(
+        db, query=query, skip=skip, limit=limit, zoom=zoom, tolerance=tolerance,
+        after_id=after.get('id'), after_rank=after.get('rank', 0),
+        geom_format=format, precision=precision
     )
+    headers = dict(validators)
+    next_cursor = next_page_cursor(roads, limit)
+    if next_cursor:
+        headers["X-Next-Cursor"] = next_cursor
+    return json_response(roads, headers, format)
+
+@router.get("/autocomplete", response_model=List[RoadName])
+async def autocomplete_roads_endpoint(
+    q: str = Query(..., min_length=1, description="Начало или часть названия дороги"),
+    limit: int = Query(10, ge=1, le=50),
+    validators: dict = conditional_get('roads'),
+    db: AsyncSession = Depends(get_read_db)
+):
+    return json_response(await road_service.autocomplete_roads(db, query=q, limit=limit), validators)
+
+@router.get("/nearest", response_model=List[NearestRoad])
+async def read_nearest_roads(
+    request: Request,
+    lon: float = Query(..., ge=-180, le=180),
+    lat: float = Query(..., ge=-90, le=90),
+    k: int = Query(5, ge=1, le=100, description="Сколько ближайших дорог вернуть"),
+):
+    return await indexed_roads(
+        request,
+        lambda: road_index.nearest(lon, lat, k),
+        lambda db: road_service.get_nearest_roads(db, lon=lon, lat=lat, k=k),
+    )
+
+@router.get("/at", response_model=List[NearestRoad])
+async def read_roads_at_point(
+    request: Request,
+    lon: float = Query(..., ge=-180, le=180),
+    lat: float = Query(..., ge=-90, le=90),
+    radius_m: float = Query(15, gt=0, le=1000, description="Допуск попадания в метрах"),
+    limit: int = Query(10, ge=1, le=100),
+):
+    return await indexed_roads(
+        request,
+        lambda: road_index.at_point(lon, lat, radius_m, limit),
+        lambda db: road_service.get_roads_near_point(db, lon=lon, lat=lat, radius_m=radius_m, limit=limit),
+    )
+
+async def cached_road(request: Request, db: AsyncSession, road_id: int) -> Response:
+    async def load(headers: dict) -> bytes:
+        db_road = await road_service.get_road(db, road_id=road_id)
+        if not db_road:
+            raise HTTPException(status_code=404, detail="Road not found")
+        return streaming.dumps(db_road)
+
+    return await cached_json(request, db, ('road', road_id), (item_tag('roads', road_id), 'roads'), ('roads',), load)
 
 @router.get("/{road_id}", response_model=Road)
-async def read_road(road_id: int, db: AsyncSession = Depends(get_db)):
-    db_road = await road_service.get_road(db, road_id=road_id)
-    if not db_road:
-        raise HTTPException(status_code=404, detail="Road not found")
-    return Road.from_orm(db_road)
+async def read_road(road_id: int, request: Request, db: AsyncSession = Depends(get_primary_read_db)):
+    return await cached_road(request, db, road_id)
 
-@router.get("/{road_id}/with-documents", response_model=RoadWithDocuments)
-async def read_road_with_documents(road_id: int, db: AsyncSession = Depends(get_db)):
-    db_road = await road_service.get_road(db, road_id=road_id)
+@router.get("/{road_id}/with-documents", response_model=RoadWithDocuments, dependencies=[conditional_get('roads', 'documents')])
+async def read_road_with_documents(road_id: int, db: AsyncSession = Depends(get_read_db)):
+    db_road = await road_service.get_road_with_documents(db, road_id=road_id)
     if not db_road:
         raise HTTPException(status_code=404, detail="Road not found")
-    documents = await road_service.get_documents_for_road(db, road_id)
-    return RoadWithDocuments(
-        id=db_road['id'],
-        name=db_road['name'],
-        geom=db_road['geom'],
-        documents=documents
-    )
+    return db_road
 
 @router.post("/", response_model=Road)
 async def create_road(road_in: RoadCreate, db: AsyncSession = Depends(get_db)):
-    db_road = await road_service.create_road(db, road_in)
+    try:
+        db_road = await road_service.create_road(db, road_in)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
     return Road.from_orm(db_road)
 
-@router.get("/{road_id}/documents", response_model=List[Document])
-async def read_road_documents(road_id: int, db: AsyncSession = Depends(get_db)):
+@router.post("/import", response_model=RoadImportReport)
+async def import_roads(
+    file: UploadFile = File(..., description="CSV (name, wkt), GeoJSON FeatureCollection или GeoJSONSeq"),
+    db: AsyncSession = Depends(get_db)
+):
+    try:
+        fmt = road_import.detect_format(file.filename)
+        return await road_import.import_roads_file(db, file.file, fmt)
+    except (ValueError, UnicodeDecodeError) as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+@router.get("/{road_id}/crosswalks", response_model=List[NearbyCrosswalk])
+async def read_road_crosswalks(
+    road_id: int,
+    within_m: Optional[float] = Query(None, gt=0, le=1000,
+                                      description="Расстояние от дороги в метрах; без него - привязанные к дороге переходы"),
+    limit: int = Query(1000, ge=1, le=settings.MAX_BBOX_FEATURES),
+    validators: dict = conditional_get('roads', 'crosswalks'),
+    db: AsyncSession = Depends(get_read_db)
+):
+    crosswalks = await road_service.get_crosswalks_near_road(db, road_id, within_m=within_m, limit=limit)
+    if crosswalks is None:
+        raise HTTPException(status_code=404, detail="Road not found")
+    return json_response(crosswalks, validators)
+
+@router.get("/{road_id}/documents", response_model=List[Document], dependencies=[conditional_get('documents')])
+async def read_road_documents(road_id: int, db: AsyncSession = Depends(get_read_db)):
     documents = await road_service.get_documents_for_road(db, road_id)
     return documents
 
@@ -70,27 +449,26 @@ async def delete_road_endpoint(road_id: int, db: AsyncSession = Depends(get_db))
     # Вернуть удалённый объект
     return Road.parse_obj(deleted_road)  # deleted_road — dict
 
-@router.get("/search", response_model=List[Road])
-async def search_roads_endpoint(
-    query: Optional[str] = Query(None, title="Search query", description="Partial road name to search"),
-    skip: int = Query(0, ge=0),
-    limit: int = Query(100, ge=1, le=100),
-    db: AsyncSession = Depends(get_db)
-):
-    roads = await road_service.search_roads(db, query=query, skip=skip, limit=limit)
-    return [Road.from_orm(r) for r in roads]
-
 @router.get("/all/basic", response_model=List[Road])
-async def get_all_roads_basic(db: AsyncSession = Depends(get_db)):
-    roads = await road_service.get_all_roads(db)
-    return [Road.from_orm(r) for r in roads]
+async def get_all_roads_basic(
+    request: Request,
+    zoom: Optional[int] = ZoomQuery,
+    tolerance: Optional[float] = ToleranceQuery,
+    format: str = GeomFormatQuery,
+    precision: Optional[int] = PrecisionQuery,
+    db: AsyncSession = Depends(get_primary_read_db),
+):
+    # Отдаем JSON массив потоком, не собирая весь слой в памяти;
+    # готовое тело сохраняется в кэш ответов
+    return await cached_stream(
+        request, db, ('roads:all', zoom, tolerance, format, precision), (list_tag('roads'),), ('roads',),
+        lambda: streaming.stream_layer('roads', partial(streaming.json_array, geom_format=format), geom_format=format,
+                                       zoom=zoom, tolerance=tolerance, precision=precision),
+    )
 
 @router.get("/{road_id}/basic", response_model=Road)
-async def get_road_basic(road_id: int, db: AsyncSession = Depends(get_db)):
-    db_road = await road_service.get_road(db, road_id=road_id)
-    if not db_road:
-        raise HTTPException(status_code=404, detail="Road not found")
-    return Road.from_orm(db_road)
+async def get_road_basic(road_id: int, request: Request, db: AsyncSession = Depends(get_primary_read_db)):
+    return await cached_road(request, db, road_id)
 
 @router.post("/{road_id}/add-document", response_model=Document)
 async def add_document(
@@ -125,17 +503,86 @@ async def delete_document_endpoint(document_id: int, db: AsyncSession = Depends(
 # --- Crosswalks ---
 
 @router.get("/crosswalks/", response_model=List[Crosswalk])
-async def read_crosswalks(skip: int = 0, limit: int = 100, db: AsyncSession = Depends(get_db)):
-    crosswalks = await road_service.get_crosswalks(db, skip=skip, limit=limit)
-    # Pydantic автоматически преобразует ORM объекты в схему
-    return crosswalks
+async def read_crosswalks(
+    request: Request,
+    skip: int = 0,
+    limit: int = 100,
+    cursor: Optional[str] = CursorQuery,
+    format: str = GeomFormatQuery,
+    precision: Optional[int] = PrecisionQuery,
+    db: AsyncSession = Depends(get_primary_read_db)
+):
+    after_id = decode_cursor(cursor)['id'] if cursor else None
+
+    async def load(headers: dict) -> bytes:
+        crosswalks = await road_service.get_crosswalks(
+            db, skip=skip, limit=limit, after_id=after_id, geom_format=format, precision=precision
+        )
+        # Курсор следующей страницы отдаем в заголовке, тело остается списком
+        next_cursor = next_page_cursor(crosswalks, limit)
+        if next_cursor:
+            headers["X-Next-Cursor"] = next_cursor
+        return streaming.dumps(crosswalks, format)
+
+    key = ('crosswalks', skip, limit, after_id, format, precision)
+    return await cached_json(request, db, key, (list_tag('crosswalks'),), ('crosswalks',), load)
+
+@router.get("/crosswalks/all", response_model=List[Crosswalk])
+async def read_all_crosswalks(
+    request: Request,
+    format: str = GeomFormatQuery,
+    precision: Optional[int] = PrecisionQuery,
+    db: AsyncSession = Depends(get_primary_read_db),
+):
+    # Как /all/basic: поток с сохранением готового тела в кэш ответов
+    return await cached_stream(
+        request, db, ('crosswalks:all', format, precision), (list_tag('crosswalks'),), ('crosswalks',),
+        lambda: streaming.stream_layer('crosswalks', partial(streaming.json_array, geom_format=format),
+                                       geom_format=format, precision=precision),
+    )
+
+@router.get("/crosswalks/bbox", response_model=List[Crosswalk])
+async def read_crosswalks_in_bbox(
+    bbox: str = Query(..., description="minx,miny,maxx,maxy в EPSG:4326"),
+    limit: int = Query(settings.MAX_BBOX_FEATURES, ge=1, le=settings.MAX_BBOX_FEATURES),
+    format: str = GeomFormatQuery,
+    precision: Optional[int] = PrecisionQuery,
+    validators: dict = conditional_get('crosswalks'),
+    db: AsyncSession = Depends(get_read_db)
+):
+    crosswalks = await road_service.get_crosswalks_in_bbox(
+        db, parse_bbox(bbox), limit=limit, geom_format=format, precision=precision
+    )
+    return json_response(crosswalks, validators, format)
+
+@router.get("/crosswalks/clusters", response_model=CrosswalkClusters)
+async def read_crosswalk_clusters(
+    bbox: str = Query(..., description="minx,miny,maxx,maxy в EPSG:4326"),
+    zoom: int = Query(..., ge=0, le=22, description="Зум карты"),
+    validators: dict = conditional_get('crosswalks'),
+    db: AsyncSession = Depends(get_read_db)
+):
+    # На крупных зумах кластеры не нужны, отдаем переходы как есть
+    if zoom > settings.CROSSWALK_CLUSTER_MAX_ZOOM:
+        crosswalks = await road_service.get_crosswalks_in_bbox(
+            db, parse_bbox(bbox), limit=settings.MAX_BBOX_FEATURES
+        )
+        content = {'zoom': zoom, 'clustered': False, 'clusters': [], 'crosswalks': crosswalks}
+    else:
+        clusters = await road_service.get_crosswalk_clusters(db, parse_bbox(bbox), zoom)
+        content = {'zoom': zoom, 'clustered': True, 'clusters': clusters, 'crosswalks': []}
+    return json_response(content, validators)
 
 @router.get("/crosswalks/{crosswalk_id}", response_model=Crosswalk)
-async def read_crosswalk(crosswalk_id: int, db: AsyncSession = Depends(get_db)):
-    db_crosswalk = await road_service.get_crosswalk(db, crosswalk_id=crosswalk_id)
-    if db_crosswalk is None:
-        raise HTTPException(status_code=404, detail="Crosswalk not found")
-    return Crosswalk.from_orm(db_crosswalk)
+async def read_crosswalk(crosswalk_id: int, request: Request, db: AsyncSession = Depends(get_primary_read_db)):
+    async def load(headers: dict) -> bytes:
+        db_crosswalk = await road_service.get_crosswalk(db, crosswalk_id=crosswalk_id)
+        if db_crosswalk is None:
+            raise HTTPException(status_code=404, detail="Crosswalk not found")
+        return streaming.dumps(db_crosswalk)
+
+    key = ('crosswalk', crosswalk_id)
+    return await cached_json(request, db, key, (item_tag('crosswalks', crosswalk_id), 'crosswalks'), ('crosswalks',), load)
 
 @router.post("/crosswalks/", response_model=Crosswalk)
 async def create_crosswalk(crosswalk: CrosswalkCreate, db: AsyncSession = Depends(get_db)):
@@ -145,13 +592,30 @@ async def create_crosswalk(crosswalk: CrosswalkCreate, db: AsyncSession = Depend
         raise HTTPException(status_code=400, detail=str(e))
     return Crosswalk.from_orm(db_crosswalk)
 
+@router.post("/crosswalks/batch", response_model=CrosswalkBatchResult)
+async def batch_crosswalks(batch: CrosswalkBatch, db: AsyncSession = Depends(get_db)):
+    conflicts = batch.conflicting_ids()
+    if conflicts:
+        raise HTTPException(status_code=400, detail={"message": "Duplicate crosswalk ids", "ids": conflicts})
+    try:
+        return await road_service.batch_crosswalks(db, batch.create, batch.update, batch.delete)
+    except GeometryValidationError as e:
+        raise HTTPException(status_code=400, detail=e.errors)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except LookupError as e:
+        raise HTTPException(status_code=404, detail={"message": "Crosswalks not found", "ids": e.args[0]})
+
 @router.put("/crosswalks/{crosswalk_id}", response_model=Crosswalk)
 async def update_crosswalk(
     crosswalk_id: int, crosswalk: CrosswalkUpdate, db: AsyncSession = Depends(get_db)
 ):
-    db_crosswalk = await road_service.update_crosswalk(
-        db, crosswalk_id=crosswalk_id, crosswalk_in=crosswalk
-    )
+    try:
+        db_crosswalk = await road_service.update_crosswalk(
+            db, crosswalk_id=crosswalk_id, crosswalk_in=crosswalk
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
     if db_crosswalk is None:
         raise HTTPException(status_code=404, detail="Crosswalk not found")
     return Crosswalk.from_orm(db_crosswalk)
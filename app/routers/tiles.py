@@ -0,0 +1,25 @@
+from fastapi import APIRouter, Depends, HTTPException, Response
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.db.session import get_primary_read_db
+from app.crud import road_service
+from app.config import settings
+from app.tile_cache import tile_cache
+
+router = APIRouter()
+
+
+@router.get("/{layer}/{z}/{x}/{y}.mvt")
+async def read_tile(layer: str, z: int, x: int, y: int, db: AsyncSession = Depends(get_primary_read_db)):
+    if layer not in road_service.TILE_LAYERS:
+        raise HTTPException(status_code=404, detail="Layer not found")
+    if not 0 <= z <= settings.TILE_MAX_ZOOM or not (0 <= x < 2 ** z and 0 <= y < 2 ** z):
+        raise HTTPException(status_code=404, detail="Tile out of range")
+
+    data = tile_cache.get(layer, z, x, y)
+    if data is None:
+        generation = tile_cache.generation(layer)
+        data = await road_service.get_tile(db, layer, z, x, y)
+        tile_cache.put(layer, z, x, y, data, generation)
+
+    return Response(content=data, media_type="application/vnd.mapbox-vector-tile")
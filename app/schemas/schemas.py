@@ -1,10 +1,12 @@
 from typing import List, Optional, Any
 from datetime import date, datetime
-from pydantic import BaseModel, ConfigDict, field_serializer, field_validator, validator
+from pydantic import BaseModel, ConfigDict, Field, field_serializer, field_validator
 from shapely import wkb
 from geoalchemy2 import WKBElement, Geometry
 import geoalchemy2
 
+from app.config import settings
+
 
 class DocumentBase(BaseModel):
     filename: str
@@ -22,6 +24,7 @@ class Document(DocumentBase):
     id: int
     road_id: int
     upload_date: Optional[datetime] = None
+    updated_at: Optional[datetime] = None
 
     model_config = ConfigDict(from_attributes=True)
 
@@ -87,6 +90,25 @@ class Road(RoadBase):
         return str(value)
 
 
+# Подсказка для поиска: только идентификатор и название, без геометрии
+class RoadName(BaseModel):
+    id: int
+    name: str
+
+    model_config = ConfigDict(from_attributes=True)
+
+
+# Отчет о массовом импорте дорог
+class ImportRowError(BaseModel):
+    line: int  # номер строки CSV/GeoJSONSeq или объекта в FeatureCollection
+    error: str
+
+
+class RoadImportReport(BaseModel):
+    imported: int
+    errors: List[ImportRowError] = []
+
+
 # Отдельная схема для дороги с документами
 class RoadWithDocuments(Road):
     documents: List[Document] = []
@@ -130,9 +152,10 @@ class RoadResponse(Road):
 # Схема для списка дорог с пагинацией
 class RoadsListResponse(BaseModel):
     roads: List[Road]
-    total_count: int
+    total_count: Optional[int] = None  # None, если подсчет не запрошен (count=none)
     skip: int
     limit: int
+    next_cursor: Optional[str] = None  # курсор следующей страницы, None на последней
 
     model_config = ConfigDict(from_attributes=True)
 
@@ -166,6 +189,7 @@ class CrosswalkCreate(CrosswalkBase):
 
 class Crosswalk(CrosswalkBase):
     id: int
+    road_id: Optional[int] = None  # ближайшая дорога
     created_at: datetime
     updated_at: datetime
 
@@ -173,10 +197,98 @@ class Crosswalk(CrosswalkBase):
         from_attributes = True
 
     # Добавьте кастомный валидатор для преобразования WKBElement в WKT
-    @validator('geom', pre=True)
+    @field_validator('geom', mode='before')
+    @classmethod
     def convert_geometry(cls, v):
         # Если геометрия уже в WKT формате, возвращаем как есть
         if isinstance(v, str) and (v.startswith('POINT') or v.startswith('LINESTRING')):
             return v
         # Иначе пытаемся конвертировать
         return convert_db_geom_to_wkt(v)
+
+
+class RoadSearchResult(Road):
+    rank: Optional[float] = None  # триграммная похожесть названия на запрос
+
+
+# Результаты пространственных запросов с расстоянием в метрах
+class NearestRoad(Road):
+    distance_m: float
+
+
+class NearbyCrosswalk(Crosswalk):
+    distance_m: Optional[float] = None
+
+
+# Кластеры переходов для мелких масштабов
+class CrosswalkCluster(BaseModel):
+    lon: float  # центроид переходов ячейки
+    lat: float
+    count: int
+    traffic_light_count: int
+    t7_count: int
+    id: Optional[int] = None  # id перехода, если он в ячейке один
+
+
+class CrosswalkClusters(BaseModel):
+    zoom: int
+    clustered: bool
+    clusters: List[CrosswalkCluster] = []
+    crosswalks: List[Crosswalk] = []  # отдельные переходы на крупных зумах
+
+
+# Пакетное API переходов
+class CrosswalkBatchUpdate(CrosswalkUpdate):
+    id: int
+
+
+class CrosswalkBatch(BaseModel):
+    create: List[CrosswalkCreate] = Field([], max_length=settings.CROSSWALK_BATCH_MAX_SIZE)
+    update: List[CrosswalkBatchUpdate] = Field([], max_length=settings.CROSSWALK_BATCH_MAX_SIZE)
+    delete: List[int] = Field([], max_length=settings.CROSSWALK_BATCH_MAX_SIZE)
+
+    def conflicting_ids(self) -> List[int]:
+        """id, которые повторяются в update/delete или есть в обоих списках"""
+        seen = set()
+        conflicts = set()
+        for crosswalk_id in [item.id for item in self.update] + list(self.delete):
+            if crosswalk_id in seen:
+                conflicts.add(crosswalk_id)
+            seen.add(crosswalk_id)
+        return sorted(conflicts)
+
+
+class CrosswalkBatchResult(BaseModel):
+    created: List[Crosswalk] = []
+    updated: List[Crosswalk] = []
+    deleted: List[int] = []
+
+
+# Схемы дельта-синхронизации
+class DeletedIds(BaseModel):
+    roads: List[int] = []
+    crosswalks: List[int] = []
+    documents: List[int] = []
+
+
+class ChangesResponse(BaseModel):
+    version: int  # передать как since в следующем запросе
+    roads: List[Road] = []
+    crosswalks: List[Crosswalk] = []
+    documents: List[Document] = []
+    deleted: DeletedIds
+
+    model_config = ConfigDict(from_attributes=True)
+
+
+# Состояние пулов соединений с БД
+class PoolStatus(BaseModel):
+    name: str  # primary или replica-N
+    size: int
+    max_overflow: int
+    checked_in: int  # свободные соединения в пуле
+    checked_out: int  # занятые запросами
+    overflow: int  # открытые сверх size (отрицательное - пул еще не заполнен)
+    saturated: bool  # новые запросы ждут освобождения соединения
+    healthy: Optional[bool] = None  # только для реплик
+    lag_seconds: Optional[float] = None
@@ -0,0 +1,96 @@
+from collections.abc import Mapping
+from typing import AsyncIterator
+
+import orjson
+
+from app.config import settings
+from app.crud import road_service
+from app.db.session import read_session, replica_read_session
+
+
+def _json_default(value):
+    # Строки SQLAlchemy (RowMapping) кодируются как объекты
+    if isinstance(value, Mapping):
+        return dict(value)
+    raise TypeError(f"Object of type {type(value).__name__} is not JSON serializable")
+
+
+def dumps(value, geom_format: str = 'wkt') -> bytes:
+    """Кодирует строки БД и словари сразу в байты JSON (orjson, даты в ISO 8601 с Z).
+
+    Для geom_format='geojson' поле geom строк (уже GeoJSON из PostGIS)
+    вставляется как JSON объект, а не как экранированная строка.
+    """
+    if geom_format == 'geojson':
+        return _dumps_geojson(value)
+    return orjson.dumps(value, default=_json_default, option=orjson.OPT_UTC_Z)
+
+
+def _dumps_geojson(value) -> bytes:
+    if isinstance(value, (list, tuple)):
+        return b'[' + b','.join(_dumps_geojson(item) for item in value) + b']'
+    if isinstance(value, Mapping):
+        if 'geom' in value:
+            fields = dumps({key: item for key, item in value.items() if key != 'geom'})
+            return fields[:-1] + (b',' if len(fields) > 2 else b'') + b'"geom":' + (value['geom'] or 'null').encode() + b'}'
+        return b'{' + b','.join(dumps(str(key)) + b':' + _dumps_geojson(item) for key, item in value.items()) + b'}'
+    return dumps(value)
+
+
+async def _join(items: AsyncIterator[bytes], prefix: bytes, separator: bytes, suffix: bytes) -> AsyncIterator[bytes]:
+    """Склеивает элементы в поток байтов, отдавая их пачками по STREAM_BATCH_SIZE"""
+    yield prefix
+    batch = []
+    first = True
+    async for item in items:
+        batch.append(item)
+        if len(batch) >= settings.STREAM_BATCH_SIZE:
+            yield (b'' if first else separator) + separator.join(batch)
+            first = False
+            batch = []
+    if batch:
+        yield (b'' if first else separator) + separator.join(batch)
+    yield suffix
+
+
+async def _objects(rows, geom_format: str) -> AsyncIterator[bytes]:
+    async for row in rows:
+        yield dumps(row, geom_format)
+
+
+async def _features(rows) -> AsyncIterator[bytes]:
+    # Геометрия уже сериализована в GeoJSON средствами PostGIS
+    async for row in rows:
+        properties = {key: value for key, value in row.items() if key != 'geom'}
+        yield b'{"type":"Feature","id":%d,"geometry":%s,"properties":%s}' % (
+            row["id"], (row["geom"] or "null").encode(), dumps(properties)
+        )
+
+
+def json_array(rows, geom_format: str = 'wkt') -> AsyncIterator[bytes]:
+    """JSON массив объектов в формате обычных list-эндпоинтов"""
+    return _join(_objects(rows, geom_format), b'[', b',', b']')
+
+
+def geojson_feature_collection(rows) -> AsyncIterator[bytes]:
+    """GeoJSON FeatureCollection; строки должны содержать geom в GeoJSON"""
+    return _join(_features(rows), b'{"type":"FeatureCollection","features":[', b',', b']}')
+
+
+def ndjson_features(rows) -> AsyncIterator[bytes]:
+    """GeoJSON объекты Feature, по одному на строку (GeoJSONSeq / NDJSON)"""
+    return _join(_features(rows), b'', b'\n', b'\n')
+
+
+async def stream_layer(layer: str, encoder, geom_format: str = 'wkt', request=None, **params) -> AsyncIterator[bytes]:
+    """Поток слоя целиком из серверного курсора.
+
+    Сессия открывается внутри генератора: зависимость get_db закрывается
+    до того, как StreamingResponse начнет отдавать тело. С request слой
+    читается с реплики (replica_read_session), без него - с основной БД:
+    так читаются тела, которые сохраняются в кэш.
+    """
+    async with (replica_read_session(request) if request is not None else read_session()) as db:
+        rows = road_service.STREAM_LAYERS[layer](db, geom_format=geom_format, **params)
+        async for chunk in encoder(rows):
+            yield chunk
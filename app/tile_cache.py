@@ -0,0 +1,187 @@
+import asyncio
+import hashlib
+import logging
+import math
+import os
+import shutil
+import time
+from pathlib import Path
+from typing import Optional
+
+from app.config import settings
+
+logger = logging.getLogger(__name__)
+
+
+class TileCache:
+    """Дисковый кэш MVT тайлов с адресацией по содержимому.
+
+    Содержимое тайла хранится один раз в objects/<sha256>, а ключ
+    layer/z/x/y указывает на хэш. Пустые и одинаковые тайлы не дублируются.
+    Объекты, на которые не указывает ни один ключ, удаляет периодический sweep.
+    """
+
+    def __init__(self, root: str):
+        self.root = Path(root)
+        # Поколение слоя растет при каждой инвалидации, чтобы тайл,
+        # построенный до записи, не попал в кэш после нее
+        self._generations = {}
+        self._sweep_task: Optional[asyncio.Task] = None
+
+    def generation(self, layer: str) -> int:
+        return self._generations.get(layer, 0)
+
+    def get(self, layer: str, z: int, x: int, y: int) -> Optional[bytes]:
+        """Получить тайл из кэша"""
+        try:
+            digest = self._key_path(layer, z, x, y).read_text()
+            return self._object_path(digest).read_bytes()
+        except (FileNotFoundError, ValueError):
+            return None
+
+    def put(self, layer: str, z: int, x: int, y: int, data: bytes, generation: int) -> None:
+        """Сохранить тайл, если слой не менялся с момента начала его построения"""
+        if z > settings.TILE_CACHE_MAX_ZOOM or generation != self.generation(layer):
+            return
+
+        digest = hashlib.sha256(data).hexdigest()
+        object_path = self._object_path(digest)
+        if object_path.exists():
+            # Свежий mtime защищает объект от sweep, пока пишется ключ
+            os.utime(object_path)
+        else:
+            self._write_atomic(object_path, data)
+        self._write_atomic(self._key_path(layer, z, x, y), digest.encode())
+
+    def invalidate(self, layer: str, bounds: tuple) -> None:
+        """Удалить тайлы слоя, которые покрывает bbox (minx, miny, maxx, maxy).
+
+        Поколение растет сразу, а файлы удаляются в рабочем потоке,
+        чтобы не блокировать цикл событий.
+        """
+        self._generations[layer] = self.generation(layer) + 1
+        _run_off_loop(self._remove_keys, layer, bounds)
+
+    def clear_layer(self, layer: str) -> None:
+        """Удалить все тайлы слоя"""
+        self._generations[layer] = self.generation(layer) + 1
+        _run_off_loop(shutil.rmtree, self.root / 'keys' / layer, True)
+
+    def sweep(self) -> int:
+        """Удалить объекты, на которые не указывает ни один ключ; возвращает их число.
+
+        Объекты моложе TILE_CACHE_SWEEP_GRACE не трогаются: put мог записать
+        объект и еще не записать ключ.
+        """
+        referenced = set()
+        for directory, _, files in os.walk(self.root / 'keys'):
+            for name in files:
+                if name.isdigit():
+                    try:
+                        referenced.add(Path(directory, name).read_text())
+                    except (FileNotFoundError, ValueError):
+                        continue
+
+        removed = 0
+        deadline = time.time() - settings.TILE_CACHE_SWEEP_GRACE
+        for directory, _, files in os.walk(self.root / 'objects'):
+            prefix = Path(directory).name
+            for name in files:
+                path = Path(directory, name)
+                if not name.endswith('.mvt') or prefix + name[:-4] in referenced:
+                    continue
+                try:
+                    if path.stat().st_mtime < deadline:
+                        path.unlink()
+                        removed += 1
+                except FileNotFoundError:
+                    continue
+        return removed
+
+    async def start(self):
+        """Запустить периодический sweep в рабочем потоке"""
+        self._sweep_task = asyncio.get_running_loop().create_task(self._sweep_periodically())
+
+    async def stop(self):
+        if self._sweep_task:
+            self._sweep_task.cancel()
+            self._sweep_task = None
+
+    async def _sweep_periodically(self):
+        while True:
+            await asyncio.sleep(settings.TILE_CACHE_SWEEP_INTERVAL)
+            try:
+                removed = await asyncio.to_thread(self.sweep)
+            except OSError as e:
+                logger.warning("Tile cache sweep failed: %s", e)
+                continue
+            if removed:
+                logger.info("Tile cache sweep removed %d objects", removed)
+
+    def _remove_keys(self, layer: str, bounds: tuple) -> None:
+        minx, miny, maxx, maxy = bounds
+        # Учитываем буфер тайла: объект у края попадает и в соседние тайлы
+        margin = settings.TILE_BUFFER / settings.TILE_EXTENT
+
+        for z in range(settings.TILE_CACHE_MAX_ZOOM + 1):
+            zoom_dir = self.root / 'keys' / layer / str(z)
+            if not zoom_dir.exists():
+                continue
+
+            x0, y0 = lonlat_to_tile(minx, maxy, z)
+            x1, y1 = lonlat_to_tile(maxx, miny, z)
+            x0, y0 = math.floor(x0 - margin), math.floor(y0 - margin)
+            x1, y1 = math.floor(x1 + margin), math.floor(y1 + margin)
+
+            # Обходим только закэшированные тайлы, а не весь диапазон
+            for x_name in os.listdir(zoom_dir):
+                if not x_name.isdigit() or not x0 <= int(x_name) <= x1:
+                    continue
+                try:
+                    y_names = os.listdir(zoom_dir / x_name)
+                except FileNotFoundError:
+                    continue
+                for y_name in y_names:
+                    if y_name.isdigit() and y0 <= int(y_name) <= y1:
+                        (zoom_dir / x_name / y_name).unlink(missing_ok=True)
+
+    def _key_path(self, layer: str, z: int, x: int, y: int) -> Path:
+        return self.root / 'keys' / layer / str(z) / str(x) / str(y)
+
+    def _object_path(self, digest: str) -> Path:
+        return self.root / 'objects' / digest[:2] / f"{digest[2:]}.mvt"
+
+    def _write_atomic(self, path: Path, data: bytes) -> None:
+        path.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = path.with_name(f"{path.name}.{os.getpid()}.tmp")
+        with open(tmp_path, 'wb') as f:
+            f.write(data)
+        os.replace(tmp_path, path)
+
+
+def _run_off_loop(func, *args) -> None:
+    """Выполнить файловую операцию в рабочем потоке, если есть цикл событий (иначе сразу)"""
+    try:
+        loop = asyncio.get_running_loop()
+    except RuntimeError:
+        func(*args)
+        return
+    future = loop.run_in_executor(None, func, *args)
+    future.add_done_callback(_log_failure)
+
+
+def _log_failure(future) -> None:
+    if not future.cancelled() and future.exception() is not None:
+        logger.warning("Tile cache cleanup failed: %s", future.exception())
+
+
+def lonlat_to_tile(lon: float, lat: float, z: int) -> tuple:
+    """Дробные координаты тайла (x, y) в схеме XYZ для точки lon/lat"""
+    lat = max(min(lat, 85.0511287798), -85.0511287798)
+    n = 2 ** z
+    x = (lon + 180.0) / 360.0 * n
+    y = (1.0 - math.asinh(math.tan(math.radians(lat))) / math.pi) / 2.0 * n
+    return min(max(x, 0.0), n - 1e-9), min(max(y, 0.0), n - 1e-9)
+
+
+tile_cache = TileCache(settings.TILE_CACHE_PATH)
@@ -431,7 +431,7 @@ useEffect(() => {
   // Загрузка всех дорог
   const loadRoads = async () => {
     try {
-      const response = await fetch('http://localhost:8000/roads/all/basic');
+      const response = await fetch('http://localhost:8000/roads/all/basic', { credentials: 'include' });
       if (response.ok) {
         const data = await response.json();
         setRoads(data);
@@ -453,7 +453,7 @@ useEffect(() => {
   const loadCrosswalks = async () => {
   try {
     console.log('Loading crosswalks...');
-    const response = await fetch('http://localhost:8000/api/v1/crosswalks/');
+    const response = await fetch('http://localhost:8000/api/v1/crosswalks/all', { credentials: 'include' });
     console.log('Response status:', response.status);
     const data = await response.json();
     console.log('Crosswalks data received:', data);
@@ -510,8 +510,8 @@ useEffect(() => {
         focusOnObject(road);
 
         const [roadResponse, docsResponse] = await Promise.all([
-          fetch(`http://localhost:8000/roads/${roadId}`),
-          fetch(`http://localhost:8000/roads/${roadId}/documents`)
+          fetch(`http://localhost:8000/roads/${roadId}`, { credentials: 'include' }),
+          fetch(`http://localhost:8000/roads/${roadId}/documents`, { credentials: 'include' })
         ]);
 
         if (roadResponse.ok && docsResponse.ok) {
@@ -572,6 +572,7 @@ useEffect(() => {
     try {
       const response = await fetch('http://localhost:8000/roads/', {
         method: 'POST',
+        credentials: 'include',
         headers: { 'Content-Type': 'application/json' },
         body: JSON.stringify({ name: roadName, geom: wkt }),
       });
@@ -605,6 +606,7 @@ useEffect(() => {
     try {
       const response = await fetch('http://localhost:8000/api/v1/crosswalks/', {
         method: 'POST',
+        credentials: 'include',
         headers: { 'Content-Type': 'application/json' },
         body: JSON.stringify({
           name: crosswalkInfo.name,
@@ -672,6 +674,7 @@ const handleFilterChange = (filterName) => {
     try {
       const response = await fetch(`http://localhost:8000/roads/${selectedRoad.id}/add-document`, {
         method: 'POST',
+        credentials: 'include',
         body: formData,
       });
 
@@ -704,6 +707,7 @@ const handleFilterChange = (filterName) => {
     try {
       const response = await fetch(`http://localhost:8000/roads/documents/${documentId}`, {
         method: 'DELETE',
+        credentials: 'include',
       });
 
       if (response.ok) {